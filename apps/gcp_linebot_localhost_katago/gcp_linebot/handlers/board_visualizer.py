@@ -1,9 +1,15 @@
+import numpy as np
 from PIL import Image, ImageDraw
+import logging
 import os
 from pathlib import Path
 
 
 class BoardVisualizer:
+    # PNG 的 zlib 壓縮等級。畫一張棋盤的時間幾乎都花在 PNG 編碼上：預設的 6 要
+    # 150-250ms，1 可以少掉 40-100ms；檔案會大 20-60%，像素完全相同
+    PNG_COMPRESS_LEVEL = 1
+
     def __init__(self, assets_dir="assets"):
         """
         初始化：載入圖片素材並設定關鍵測量值
@@ -61,6 +67,14 @@ class BoardVisualizer:
         self.offset_x = stone_diameter // 2
         self.offset_y = stone_diameter // 2
 
+        # 每個交叉點貼棋子的像素座標固定不變，先算好整張表，畫圖時直接查
+        self._paste_coords = [
+            [self.get_pixel_coords(r, c) for c in range(19)] for r in range(19)
+        ]
+
+        # 初始化之後所有屬性都只會被讀取，draw_board 只在自己的 canvas 副本上作畫，
+        # 所以同一個實例可以讓多個請求 (執行緒) 同時使用
+
     def get_pixel_coords(self, r, c):
         """
         輔助函式：將陣列索引 (row, col) 轉為像素座標 (paste_x, paste_y)
@@ -80,87 +94,76 @@ class BoardVisualizer:
         territory=None,
     ):
         """
-        :param board_state: 19x19 二維陣列
+        :param board_state: 19x19 二維陣列 (GoBoard.array 或二維 list)
         :param last_move: Tuple (row, col) 代表最後一手的位置，若無則傳入 None
-        :param output_filename: 檔名
+        :param output_filename: 檔名，或可寫入的檔案物件 (例如 io.BytesIO)
         :param move_numbers: Dict {(row, col): move_number} 標註每手棋的手順
         :param territory: 19x19 二維陣列，0=中立, 1=黑地, 2=白地
         """
         canvas = self.base_img.copy()
         size = 19
+        # 統一成 uint8 的 NumPy 陣列；傳入 GoBoard.array 時不會複製
+        board_state = np.asarray(board_state, dtype=np.uint8)
 
         # 1. 先畫所有「普通」棋子
-        for r in range(size):
-            for c in range(size):
-                stone_color = board_state[r][c]
-                if stone_color == 0:
-                    continue
-
-                # 如果這個位置是 last_move，我們先跳過不畫？
-                # 不，通常建議先畫普通棋子當底，最後再蓋上 last_move 標記比較保險，
-                # 除非你的 last_move 圖片本身就是一顆完整的棋子。
-                # 這裡我們採取：先畫所有棋子，最後再覆蓋 last_move。
-
-                stone_img = self.b_stone if stone_color == 1 else self.w_stone
-                px, py = self.get_pixel_coords(r, c)
-                canvas.paste(stone_img, (px, py), stone_img)
+        # np.nonzero 直接找出有棋子的點，不必逐格掃過空點
+        rows, cols = np.nonzero(board_state)
+        colors = board_state[rows, cols]
+        paste = canvas.paste
+        paste_coords = self._paste_coords
+        b_stone, w_stone = self.b_stone, self.w_stone
+        for r, c, stone_color in zip(rows.tolist(), cols.tolist(), colors.tolist()):
+            # 如果這個位置是 last_move，我們先跳過不畫？
+            # 不，通常建議先畫普通棋子當底，最後再蓋上 last_move 標記比較保險，
+            # 除非你的 last_move 圖片本身就是一顆完整的棋子。
+            # 這裡我們採取：先畫所有棋子，最後再覆蓋 last_move。
+
+            stone_img = b_stone if stone_color == 1 else w_stone
+            paste(stone_img, paste_coords[r][c], stone_img)
 
         # 2. ### 領地：實心正方形；有棋子且屬對方領地時在棋子上畫小正方形（被吃掉）
         if territory is not None:
             try:
-                overlay = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
-                draw_territory = ImageDraw.Draw(overlay)
+                # 領地標記都是不透明的純色，直接畫在 canvas 上，
+                # 不必再開一張整張大小的透明圖層做 alpha_composite
+                draw_territory = ImageDraw.Draw(canvas)
                 # 實心正方形邊長的一半（空點上的領地）
                 half_side = int(self.GRID_SIZE * 0.2)
                 # 棋子上「被吃」標記的小正方形邊長的一半
                 half_side_captured = int(self.GRID_SIZE * 0.2)
 
-                for r in range(size):
-                    for c in range(size):
-                        if (
-                            r < 0
-                            or r >= len(territory)
-                            or c < 0
-                            or c >= len(territory[r])
-                        ):
-                            continue
-                        t = territory[r][c]
-                        if t not in (1, 2):
-                            continue
-
-                        center_x = self.MARGIN_X + (c * self.GRID_SIZE)
-                        center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
-                        stone_color = board_state[r][c]
-
-                        if stone_color == 0:
-                            # 空點：畫實心正方形領地
-                            left = center_x - half_side
-                            top = center_y - half_side
-                            right = center_x + half_side
-                            bottom = center_y + half_side
-                            if t == 1:
-                                color = (0, 0, 0, 255)
-                            else:
-                                color = (255, 255, 255, 255)
-                            draw_territory.rectangle((left, top, right, bottom), fill=color)
-                        else:
-                            # 有棋子：若領地為對方（算被吃掉），在棋子上畫小實心正方形
-                            # t==1 黑地、t==2 白地；stone 1=黑 2=白
-                            if (t == 1 and stone_color == 2) or (t == 2 and stone_color == 1):
-                                left = center_x - half_side_captured
-                                top = center_y - half_side_captured
-                                right = center_x + half_side_captured
-                                bottom = center_y + half_side_captured
-                                if t == 1:
-                                    color = (0, 0, 0, 255)
-                                else:
-                                    color = (255, 255, 255, 255)
-                                draw_territory.rectangle((left, top, right, bottom), fill=color)
-
-                canvas = Image.alpha_composite(canvas.convert("RGBA"), overlay)
+                territory = np.asarray(territory, dtype=np.uint8)[:size, :size]
+                # 只走訪有標記領地的點 (1=黑地, 2=白地)
+                t_rows, t_cols = np.nonzero((territory == 1) | (territory == 2))
+                for r, c in zip(t_rows.tolist(), t_cols.tolist()):
+                    t = territory[r, c]
+                    center_x = self.MARGIN_X + (c * self.GRID_SIZE)
+                    center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
+                    stone_color = board_state[r, c]
+
+                    if stone_color == 0:
+                        # 空點：畫實心正方形領地
+                        half = half_side
+                    elif (t == 1 and stone_color == 2) or (t == 2 and stone_color == 1):
+                        # 有棋子：若領地為對方（算被吃掉），在棋子上畫小實心正方形
+                        # t==1 黑地、t==2 白地；stone 1=黑 2=白
+                        half = half_side_captured
+                    else:
+                        continue
+
+                    color = (0, 0, 0, 255) if t == 1 else (255, 255, 255, 255)
+                    draw_territory.rectangle(
+                        (
+                            center_x - half,
+                            center_y - half,
+                            center_x + half,
+                            center_y + half,
+                        ),
+                        fill=color,
+                    )
+
                 canvas = canvas.convert("RGB")
             except Exception as e:
-                import logging
                 logging.warning(f"Failed to draw territory overlay: {e}")
 
         # 3. ### 新增：處理最後一手 (Last Move)
@@ -180,5 +183,7 @@ class BoardVisualizer:
                     canvas.paste(marker_img, (px, py), marker_img)
 
         # 儲存
-        canvas.save(output_filename, format="PNG")
+        canvas.save(
+            output_filename, format="PNG", compress_level=self.PNG_COMPRESS_LEVEL
+        )
         return output_filename
@@ -1,14 +1,24 @@
+import io
 import os
 import re
-import json
+import hashlib
+import logging
 import time
+import uuid
+import weakref
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
+from urllib.parse import quote, urlparse
+
+import httpx
+import numpy as np
 from linebot.v3.messaging import (
     Configuration,
     ApiClient,
-    MessagingApi,
+    AsyncApiClient,
+    AsyncMessagingApi,
     MessagingApiBlob,
     ReplyMessageRequest,
     PushMessageRequest,
@@ -20,10 +30,19 @@ from linebot.v3.messaging.models import (
     FlexContainer,
 )
 from linebot.v3.messaging.exceptions import ApiException
+import orjson
 from sgfmill import sgf
 
 from config import config
 from logger import logger
+from services.storage import (
+    download_file_if_modified,
+    file_exists,
+    get_latest_file,
+    get_public_url,
+    upload_buffer,
+    upload_buffer_with_generation,
+)
 
 from handlers.go_engine import GoBoard
 from handlers.board_visualizer import BoardVisualizer
@@ -31,13 +50,173 @@ from handlers.board_visualizer import BoardVisualizer
 # Initialize LINE Bot API v3
 configuration = Configuration(access_token=config["line"]["channel_access_token"])
 api_client = ApiClient(configuration)
-line_bot_api = MessagingApi(api_client)
 blob_api = MessagingApiBlob(api_client)
 
+# 回覆 / 推播訊息用非同步 (aiohttp) 的 client，不必每次都佔用一個 thread pool worker；
+# aiohttp 的 session 要在 event loop 裡建立，所以第一次使用時才建立
+_async_api_client: Optional[AsyncApiClient] = None
+_line_bot_api: Optional[AsyncMessagingApi] = None
+
+
+def get_line_bot_api() -> AsyncMessagingApi:
+    """Shared async Messaging API client (created on first use inside the event loop)"""
+    global _async_api_client, _line_bot_api
+    if _line_bot_api is None:
+        _async_api_client = AsyncApiClient(configuration)
+        _line_bot_api = AsyncMessagingApi(_async_api_client)
+    return _line_bot_api
+
+
+async def close_line_bot_api():
+    """Close the async Messaging API client (called on app shutdown)"""
+    global _async_api_client, _line_bot_api
+    if _async_api_client is not None:
+        await _async_api_client.close()
+        _async_api_client = None
+        _line_bot_api = None
+
 
 # Initialize board visualizer (shared instance)
 visualizer = BoardVisualizer()
 
+
+# (盤面 361 bytes, 最後一手) -> PNG。悔棋退回上一個局面、或同一個盤面再顯示一次時，
+# 不必重新貼棋子跟做 PNG 編碼。一張約 200-400KB，只留最近用到的幾張
+_BOARD_PNG_CACHE_MAX = 32
+_board_png_cache: Dict[Tuple[bytes, Optional[Tuple[int, int]]], bytes] = {}
+
+
+def render_board_png(board_state, **kwargs) -> bytes:
+    """Draw the board with the shared visualizer and return the PNG bytes
+
+    Plain boards (only last_move given) are cached by position
+    """
+    cache_key = None
+    if kwargs.keys() <= {"last_move"}:
+        last_move = kwargs.get("last_move")
+        cache_key = (
+            np.asarray(board_state, dtype=np.uint8).tobytes(),
+            tuple(last_move) if last_move is not None else None,
+        )
+        png_bytes = _board_png_cache.pop(cache_key, None)
+        if png_bytes is not None:
+            _board_png_cache[cache_key] = png_bytes
+            return png_bytes
+
+    buffer = io.BytesIO()
+    visualizer.draw_board(board_state, output_filename=buffer, **kwargs)
+    png_bytes = buffer.getvalue()
+
+    if cache_key is not None:
+        _board_png_cache[cache_key] = png_bytes
+        while len(_board_png_cache) > _BOARD_PNG_CACHE_MAX:
+            del _board_png_cache[next(iter(_board_png_cache))]
+    return png_bytes
+
+
+# Review SGF file names: name_timestamp.sgf where timestamp is digits
+_SGF_TIMESTAMP_RE = re.compile(r"_(\d+)\.sgf$")
+
+# ============================================================================
+# In-process caches (validated by GCS object generation)
+# ============================================================================
+# Cloud Run 可能同時有多個 instance 寫同一個檔案，所以快取一律記下讀到 / 寫入時的
+# GCS generation，下次讀取時用條件式下載驗證：檔案沒變只會拿到 304 (不傳內容、
+# 不用重新解析)，變了就照常下載
+_CACHE_MAX_TARGETS = 128
+
+# target_id -> (generation, game_state.json 內容, 最後一次確認是最新版的 time.monotonic())
+_state_meta_cache: Dict[str, Tuple[int, Dict[str, Any], float]] = {}
+# 剛確認過 (或剛寫入) 的 metadata 在這段時間內直接沿用，不再發條件式請求：
+# 處理一則訊息時 get_game_state / get_game_id / save_game_sgf / is_vs_ai_mode
+# 會接連讀好幾次。其他 instance 的寫入最多晚這麼久才會被看到
+_STATE_META_FRESH_SECONDS = 1.0
+# target_id -> 讀取 metadata 用的 lock：同一個 target 同時只發一個請求，
+# 其他人等它完成後直接用快取 (沒人在用的 lock 會自動回收)
+_state_meta_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+# target_id -> (SGF remote path, generation, 由該 SGF 還原的 game state)
+_game_state_cache: Dict[str, Tuple[str, int, Dict[str, Any]]] = {}
+# target_id -> (棋譜內容 digest, 上傳時間, save_sgf_file 的回傳值)
+_last_review_upload: Dict[str, Tuple[bytes, float, Dict[str, str]]] = {}
+# 只在這段時間內把相同內容視為重送；其他 instance 在這之後可能已經上傳了別的棋譜
+_REVIEW_DEDUP_SECONDS = 60
+# SGF 節點 -> (下完該手之後的盤面快照, move_count, current_turn)。
+# 同一個 SGF 物件再次還原 (例如連續悔棋) 時從最近的快照接著下；節點被回收時自動移除
+_node_board_cache: "weakref.WeakKeyDictionary[Any, Tuple[GoBoard, int, int]]" = (
+    weakref.WeakKeyDictionary()
+)
+# 還原時每隔幾手存一份快照
+_SNAPSHOT_INTERVAL = 16
+
+
+def _discard_task(task: asyncio.Task):
+    """取消不再需要的背景任務，並取走它可能的例外 (避免 "never retrieved" 警告)"""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def _cache_put(cache: Dict[str, Any], target_id: str, entry: Any):
+    """放入快取 (最近寫入的排在最後)，超過上限時丟掉最舊的"""
+    cache.pop(target_id, None)
+    cache[target_id] = entry
+    while len(cache) > _CACHE_MAX_TARGETS:
+        del cache[next(iter(cache))]
+
+
+def _state_meta_put(
+    target_id: str, generation: int, state_data: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any], float]:
+    """放入 metadata 快取，但不讓舊的 generation 蓋掉新的
+
+    load 的條件式下載途中可能有 save 寫入了更新的版本，下載完成時快取裡已經是
+    較新的 generation，這時保留較新的那份。回傳快取裡最後留下的 entry
+    """
+    current = _state_meta_cache.get(target_id)
+    if current is not None and current[0] > generation:
+        return current
+    entry = (generation, state_data, time.monotonic())
+    _cache_put(_state_meta_cache, target_id, entry)
+    return entry
+
+
+# 呼叫 localhost KataGo 服務共用的 HTTP client：重複使用連線 (keep-alive)，
+# 不必每個請求都重新建立連線。各呼叫端照舊自己指定 timeout
+_http_client = httpx.AsyncClient(
+    timeout=30.0, limits=httpx.Limits(max_keepalive_connections=20)
+)
+
+
+async def close_http_client():
+    """Close the shared HTTP client (called on app shutdown)"""
+    await _http_client.aclose()
+
+
+# ============================================================================
+# GCS path layout per target
+# ============================================================================
+
+
+class _TargetPaths(NamedTuple):
+    state: str  # target_{id}/state/game_state.json
+    sgf_file_path: str  # target_{id}/state/sgf_file_path.json
+    boards_prefix: str  # target_{id}/boards/ (後面接 {game_id}/...)
+    reviews_prefix: str  # target_{id}/reviews/
+
+
+@lru_cache(maxsize=1024)
+def _target_paths(target_id: str) -> _TargetPaths:
+    """每個 target 的固定路徑只組一次字串"""
+    base = f"target_{target_id}/"
+    return _TargetPaths(
+        state=f"{base}state/game_state.json",
+        sgf_file_path=f"{base}state/sgf_file_path.json",
+        boards_prefix=f"{base}boards/",
+        reviews_prefix=f"{base}reviews/",
+    )
+
+
 # ============================================================================
 # State persistence functions (GCS-based, for Cloud Run stateless instances)
 # ============================================================================
@@ -46,21 +225,21 @@ visualizer = BoardVisualizer()
 async def save_state_to_gcs(target_id: str, state_data: Dict[str, Any]) -> bool:
     """Save game state to GCS with no-cache to prevent caching issues"""
     try:
-        from services.storage import upload_buffer
-        import json
-
-        remote_path = f"target_{target_id}/state/game_state.json"
-        state_json = json.dumps(state_data, default=str).encode("utf-8")
+        remote_path = _target_paths(target_id).state
+        # orjson 直接輸出 UTF-8 bytes，不需要再 encode
+        state_json = orjson.dumps(state_data, default=str)
         logger.info(f"save_state_to_gcs: state_json = {state_json.decode('utf-8')}")
 
         # 設定快取控制：no-store 確保每次都要回源伺服器檢查
         # 這樣可以避免公開 URL 的快取問題
-        await upload_buffer(
+        _, generation = await upload_buffer_with_generation(
             state_json,
             remote_path,
             content_type="application/json",
             cache_control="no-store",
         )
+        # write-through：剛寫入的內容直接放進快取
+        _state_meta_put(target_id, generation, orjson.loads(state_json))
         logger.debug(f"Saved game state for {target_id} to GCS (with no-cache)")
         return True
     except Exception as error:
@@ -73,18 +252,34 @@ async def save_state_to_gcs(target_id: str, state_data: Dict[str, Any]) -> bool:
 async def load_state_from_gcs(target_id: str) -> Optional[Dict[str, Any]]:
     """Load game state from GCS using SDK (bypasses public cache)"""
     try:
-        from services.storage import download_file_as_text, file_exists
-        import json
-
-        remote_path = f"target_{target_id}/state/game_state.json"
-        if not await file_exists(remote_path):
-            return None
-
-        # 使用 SDK 讀取會直接繞過公開快取層，保證拿到最新版
-        state_text = await download_file_as_text(remote_path)
-        state_data = json.loads(state_text)
+        lock = _state_meta_locks.get(target_id)
+        if lock is None:
+            lock = _state_meta_locks[target_id] = asyncio.Lock()
+        async with lock:
+            cached = _state_meta_cache.get(target_id)
+            if cached and time.monotonic() - cached[2] < _STATE_META_FRESH_SECONDS:
+                state_data = cached[1]
+            else:
+                # 使用 SDK 讀取會直接繞過公開快取層，保證拿到最新版；
+                # 帶上快取的 generation，檔案沒變就不用重新下載
+                state_bytes, generation = await download_file_if_modified(
+                    _target_paths(target_id).state, cached[0] if cached else None
+                )
+                if generation is None:
+                    # 下載途中 save 寫入的新 entry 不要一起丟掉
+                    if _state_meta_cache.get(target_id) is cached:
+                        _state_meta_cache.pop(target_id, None)
+                    return None
+
+                if state_bytes is None:
+                    state_data = cached[1]
+                else:
+                    # orjson 可以直接解析 bytes，不需要先 decode 成字串
+                    state_data = orjson.loads(state_bytes)
+                state_data = _state_meta_put(target_id, generation, state_data)[1]
         logger.debug(f"Loaded game state for {target_id} from GCS: {state_data}")
-        return state_data
+        # 呼叫端會直接修改回傳的 dict，回傳複本以免改到快取
+        return dict(state_data)
     except Exception as error:
         logger.error(
             f"Failed to load state from GCS for {target_id}: {error}", exc_info=True
@@ -95,12 +290,9 @@ async def load_state_from_gcs(target_id: str) -> Optional[Dict[str, Any]]:
 async def save_sgf_file_path(target_id: str, sgf_path: str, file_name: str) -> bool:
     """Save SGF file path to GCS"""
     try:
-        from services.storage import upload_buffer
-        import json
-
-        remote_path = f"target_{target_id}/state/sgf_file_path.json"
+        remote_path = _target_paths(target_id).sgf_file_path
         data = {"sgf_path": sgf_path, "file_name": file_name}
-        data_json = json.dumps(data).encode("utf-8")
+        data_json = orjson.dumps(data)
         await upload_buffer(data_json, remote_path)
         logger.debug(f"Saved SGF file path for {target_id} to GCS")
         return True
@@ -115,15 +307,12 @@ async def save_sgf_file_path(target_id: str, sgf_path: str, file_name: str) -> b
 async def load_sgf_file_path(target_id: str) -> Optional[Dict[str, str]]:
     """Load SGF file path from GCS"""
     try:
-        from services.storage import download_file, file_exists
-        import json
-
-        remote_path = f"target_{target_id}/state/sgf_file_path.json"
-        if not await file_exists(remote_path):
+        remote_path = _target_paths(target_id).sgf_file_path
+        # 直接下載；檔案不存在時回傳 None，省掉先查 file_exists 的一次來回
+        data_bytes, _ = await download_file_if_modified(remote_path)
+        if data_bytes is None:
             return None
-
-        data_bytes = await download_file(remote_path)
-        data = json.loads(data_bytes.decode("utf-8"))
+        data = orjson.loads(data_bytes)
         logger.debug(f"Loaded SGF file path for {target_id} from GCS")
         return data
     except Exception as error:
@@ -136,18 +325,32 @@ async def load_sgf_file_path(target_id: str) -> Optional[Dict[str, str]]:
 
 # Bot info cache
 _bot_display_name: Optional[str] = None
+_bot_user_id: Optional[str] = None
+# 避免第一次同時有多個事件進來時各自打一次 get_bot_info
+_bot_user_id_lock = asyncio.Lock()
 
 # Get Bot's own User ID
 async def get_bot_user_id() -> Optional[str]:
-    """Get bot user ID directly from LINE API"""
-    try:
-        bot_info = await asyncio.to_thread(line_bot_api.get_bot_info)
-        bot_user_id = bot_info.user_id
-        logger.debug(f"Bot User ID: {bot_user_id}")
-        return bot_user_id
-    except Exception as error:
-        logger.error(f"Failed to get bot info: {error}", exc_info=True)
-        return None
+    """Get bot user ID from LINE API (cached)"""
+    global _bot_user_id, _bot_display_name
+    if _bot_user_id is not None:
+        return _bot_user_id
+
+    async with _bot_user_id_lock:
+        if _bot_user_id is not None:
+            return _bot_user_id
+
+        try:
+            bot_info = await get_line_bot_api().get_bot_info()
+            _bot_user_id = bot_info.user_id
+            # 同一次回應裡就有顯示名稱，順便存起來
+            if _bot_display_name is None:
+                _bot_display_name = bot_info.display_name
+            logger.debug(f"Bot User ID: {_bot_user_id}")
+            return _bot_user_id
+        except Exception as error:
+            logger.error(f"Failed to get bot info: {error}", exc_info=True)
+            return None
 
 
 async def get_bot_display_name() -> Optional[str]:
@@ -157,7 +360,7 @@ async def get_bot_display_name() -> Optional[str]:
         return _bot_display_name
     
     try:
-        bot_info = await asyncio.to_thread(line_bot_api.get_bot_info)
+        bot_info = await get_line_bot_api().get_bot_info()
         _bot_display_name = bot_info.display_name
         logger.debug(f"Bot Display Name: {_bot_display_name}")
         return _bot_display_name
@@ -171,22 +374,114 @@ def is_valid_https_url(url: str) -> bool:
     if not url or not isinstance(url, str):
         return False
 
-    try:
-        from urllib.parse import urlparse
+    # 常見情況 (GCS 公開網址) 直接比對前綴，不必建立 ParseResult
+    if url.startswith("https://"):
+        return True
 
+    # 其他寫法 (例如大寫的 HTTPS://) 仍交給 urlparse 判斷 scheme
+    try:
         parsed = urlparse(url)
         return parsed.scheme == "https"
     except Exception:
         return False
 
 
+# Command patterns used by handle_text_message (compiled once at import)
+# Board coordinates like "D4", "Q16" (skips 'I')
+_COORD_RE = re.compile(r"^[A-HJ-T]([1-9]|1[0-9])$")
+_LOAD_GAME_RE = re.compile(r"(?:讀取|load)\s*(game_\d+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=8)
+def _text_mention_re(bot_display_name: str) -> re.Pattern:
+    """Pattern for text mentions "@{bot_display_name} command" (desktop LINE)"""
+    # Escape special regex characters in bot display name
+    return re.compile(rf"^@{re.escape(bot_display_name)}\s+(.+)$", re.IGNORECASE)
+
+
+# 整句 (轉小寫後) 完全相同才觸發的指令
+_EXACT_COMMANDS = {
+    "help": "help",
+    "幫助": "help",
+    "說明": "help",
+    "覆盤": "review",
+    "review": "review",
+    "形勢": "evaluation",
+    "形式": "evaluation",
+    "evaluation": "evaluation",
+    "對弈": "vs",
+    "vs": "vs",
+    "對弈 ai": "vs_ai",
+    "對弈ai": "vs_ai",
+    "vs ai": "vs_ai",
+    "vsai": "vs_ai",
+    "對弈 free": "vs_free",
+    "對弈free": "vs_free",
+    "vs free": "vs_free",
+    "vsfree": "vs_free",
+}
+
+# 句子裡出現就觸發的關鍵字，一次 regex 掃描全部找出來
+_KEYWORD_COMMANDS = {
+    "悔棋": "undo",
+    "undo": "undo",
+    "讀取": "load",
+    "load": "load",
+    "投子": "resign",
+    "重置": "reset",
+    "reset": "reset",
+}
+_KEYWORD_RE = re.compile("|".join(map(re.escape, _KEYWORD_COMMANDS)))
+# 同一句出現多個關鍵字時的優先順序 (悔棋 > 讀取 > 投子 > 重置)
+_KEYWORD_PRIORITY = ("undo", "load", "resign", "reset")
+
+
+def _parse_command(text: str) -> Optional[str]:
+    """Map a message to its command name ("help", "undo", ...), or None"""
+    text_lower = text.lower()
+    command = _EXACT_COMMANDS.get(text_lower)
+    if command is not None:
+        return command
+    found = {_KEYWORD_COMMANDS[m.group()] for m in _KEYWORD_RE.finditer(text_lower)}
+    for command in _KEYWORD_PRIORITY:
+        if command in found:
+            return command
+    return None
+
+
+# quote(part, safe="") 不會改動的字元 (加上路徑分隔的 /)
+_URL_SAFE_RE = re.compile(r"[A-Za-z0-9\-._~/]*")
+
+
 def encode_url_path(path: str) -> str:
     """Encode URL path (preserve slashes, encode other special characters)"""
-    from urllib.parse import quote
+    # 一般 GCS 路徑 (target_xxx/boards/...) 本來就不需要編碼，直接回傳
+    if path.isascii() and _URL_SAFE_RE.fullmatch(path):
+        return path
 
     return "/".join(quote(part, safe="") for part in path.split("/"))
 
 
+# Static parts of the move-review bubble, built once and shared by every call.
+# The dicts are only serialized, never mutated, so sharing them is safe.
+_COLOR_GREEN = "#1DB446"
+_COLOR_RED = "#FF6B6B"
+_COLOR_TEAL = "#4ECDC4"
+_SEPARATOR_MD = {"type": "separator", "margin": "md"}
+_HERO_IMAGE_TEMPLATE = {
+    "type": "image",
+    "size": "full",
+    "aspectRatio": "1:1",
+    "aspectMode": "cover",
+}
+_FOOTER_BUTTON_TEMPLATE = {
+    "type": "button",
+    "style": "primary",
+    "height": "sm",
+    "color": _COLOR_GREEN,
+}
+
+
 def create_video_preview_bubble(
     move_number: int,
     color: str,
@@ -215,7 +510,7 @@ def create_video_preview_bubble(
             "text": f"📍 第 {move_number} 手（{color_text}）",
             "weight": "bold",
             "size": "lg",
-            "color": "#1DB446",
+            "color": _COLOR_GREEN,
         },
         {
             "type": "text",
@@ -240,7 +535,7 @@ def create_video_preview_bubble(
                 "type": "text",
                 "text": winrate_text,
                 "size": "sm",
-                "color": "#FF6B6B" if winrate_diff > 0 else "#4ECDC4",
+                "color": _COLOR_RED if winrate_diff > 0 else _COLOR_TEAL,
                 "margin": "sm",
             }
         )
@@ -252,12 +547,12 @@ def create_video_preview_bubble(
                 "type": "text",
                 "text": f"目差損失：{score_loss:.1f} 目",
                 "size": "sm",
-                "color": "#FF6B6B",
+                "color": _COLOR_RED,
                 "margin": "sm",
             }
         )
 
-    body_contents.append({"type": "separator", "margin": "md"})
+    body_contents.append(_SEPARATOR_MD)
     body_contents.append(
         {
             "type": "text",
@@ -272,11 +567,8 @@ def create_video_preview_bubble(
     return {
         "type": "bubble",
         "hero": {
-            "type": "image",
+            **_HERO_IMAGE_TEMPLATE,
             "url": gif_url,
-            "size": "full",
-            "aspectRatio": "1:1",
-            "aspectMode": "cover",
             "action": {"type": "uri", "uri": gif_url, "label": "觀看動畫"},
         },
         "body": {
@@ -290,15 +582,12 @@ def create_video_preview_bubble(
             "spacing": "sm",
             "contents": [
                 {
-                    "type": "button",
-                    "style": "primary",
-                    "height": "sm",
+                    **_FOOTER_BUTTON_TEMPLATE,
                     "action": {
                         "type": "uri",
                         "label": "🎬 觀看動態棋譜",
                         "uri": gif_url,
                     },
-                    "color": "#1DB446",
                 }
             ],
         },
@@ -319,23 +608,26 @@ def create_carousel_flex_message(
     }
 
 
+# Static parts of the SGF download bubble
+_SGF_FILE_TITLE = {
+    "type": "text",
+    "text": "📄 當前棋譜檔案",
+    "weight": "bold",
+    "size": "xl",
+    "color": _COLOR_GREEN,
+}
+
+
 def create_sgf_file_flex_message(file_url: str, game_id: str) -> FlexMessage:
     """Create Flex Message for SGF file download"""
-    import json
-
+    # 只有 Game ID 和下載網址會變，其餘共用上面的常數
     flex_contents = {
         "type": "bubble",
         "body": {
             "type": "box",
             "layout": "vertical",
             "contents": [
-                {
-                    "type": "text",
-                    "text": "📄 當前棋譜檔案",
-                    "weight": "bold",
-                    "size": "xl",
-                    "color": "#1DB446",
-                },
+                _SGF_FILE_TITLE,
                 {
                     "type": "text",
                     "text": f"Game ID: {game_id}",
@@ -343,10 +635,7 @@ def create_sgf_file_flex_message(file_url: str, game_id: str) -> FlexMessage:
                     "color": "#666666",
                     "margin": "md",
                 },
-                {
-                    "type": "separator",
-                    "margin": "md",
-                },
+                _SEPARATOR_MD,
             ],
         },
         "footer": {
@@ -355,21 +644,19 @@ def create_sgf_file_flex_message(file_url: str, game_id: str) -> FlexMessage:
             "spacing": "sm",
             "contents": [
                 {
-                    "type": "button",
-                    "style": "primary",
-                    "height": "sm",
+                    **_FOOTER_BUTTON_TEMPLATE,
                     "action": {
                         "type": "uri",
                         "label": "📥 下載棋譜檔案",
                         "uri": file_url,
                     },
-                    "color": "#1DB446",
                 },
             ],
         },
     }
 
-    flex_container = FlexContainer.from_json(json.dumps(flex_contents))
+    # 直接從 dict 建立，省掉 dumps 成 JSON 字串再 parse 回來的來回
+    flex_container = FlexContainer.from_dict(flex_contents)
     return FlexMessage(
         alt_text="當前棋譜檔案",
         contents=flex_container,
@@ -426,23 +713,45 @@ async def save_sgf_file(
     If target_id is provided, save to target_{target_id}/reviews/ folder
     Otherwise, save to sgf/ folder (for backward compatibility)
     """
-    from services.storage import upload_buffer
-    import time
+    now = time.time()
+    digest = hashlib.blake2b(file_buffer, digest_size=16).digest()
+
+    # 同一份棋譜剛剛才上傳過 (LINE 重送 webhook、使用者連按兩次)：沿用上次的檔案，
+    # 不再 PUT 一次。只比對這個 target 最近一次的上傳，確保覆盤拿到的「最新棋譜」不變
+    last = _last_review_upload.get(target_id) if target_id else None
+    if (
+        last is not None
+        and last[0] == digest
+        and now - last[1] < _REVIEW_DEDUP_SECONDS
+        and last[2]["fileName"] == original_file_name
+    ):
+        logger.info(f"SGF unchanged since last upload, reusing {last[2]['remotePath']}")
+        return dict(last[2])
 
     # Generate unique path for SGF file
-    timestamp = int(time.time())
+    timestamp = int(now)
     if target_id:
         # Save to reviews folder for review processing
-        remote_path = f"target_{target_id}/reviews/{original_file_name}_{timestamp}.sgf"
+        remote_path = f"{_target_paths(target_id).reviews_prefix}{original_file_name}_{timestamp}.sgf"
 
     # Upload to GCS
-    gcs_path = await upload_buffer(file_buffer, remote_path)
+    if target_id:
+        # 同時記下這個 target 最新上傳的棋譜，覆盤時讀這個小檔就好，不必列出整個 reviews 資料夾
+        gcs_path, _ = await asyncio.gather(
+            upload_buffer(file_buffer, remote_path, gzip_encode=True),
+            save_sgf_file_path(target_id, remote_path, original_file_name),
+        )
+    else:
+        gcs_path = await upload_buffer(file_buffer, remote_path, gzip_encode=True)
 
-    return {
+    saved_file = {
         "fileName": original_file_name,
         "filePath": gcs_path,
         "remotePath": remote_path,
     }
+    if target_id:
+        _cache_put(_last_review_upload, target_id, (digest, now, saved_file))
+    return dict(saved_file)
 
 
 async def send_message(
@@ -452,9 +761,8 @@ async def send_message(
     # If there's a replyToken, try to use replyMessage
     if reply_token:
         try:
-            # Run synchronous call in thread pool
             request = ReplyMessageRequest(reply_token=reply_token, messages=messages)
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return True  # Successfully used replyMessage
         except ApiException as e:
             # replyToken may have expired, fallback to pushMessage
@@ -465,28 +773,25 @@ async def send_message(
 
     # Use pushMessage
     request = PushMessageRequest(to=target_id, messages=messages)
-    await asyncio.to_thread(line_bot_api.push_message, request)
+    await get_line_bot_api().push_message(request)
     return False  # Used pushMessage
 
 
 async def handle_review_command(target_id: str, reply_token: Optional[str]):
     """Handle review command - POST to localhost service for review"""
-    import httpx
-    import uuid
-
     used_reply_token = False
 
     try:
-        # Get latest SGF file from reviews folder
-        from services.storage import list_files, storage_client, bucket
-
-        reviews_prefix = f"target_{target_id}/reviews/"
-        all_files = await list_files(reviews_prefix)
-
-        # Filter only SGF files
-        sgf_files = [f for f in all_files if f.lower().endswith(".sgf")]
-
-        if not sgf_files:
+        # Get latest SGF file: save_sgf_file records it in sgf_file_path.json
+        latest = await load_sgf_file_path(target_id)
+        latest_sgf_path = latest.get("sgf_path") if latest else None
+        if not latest_sgf_path:
+            # 在有這個紀錄之前上傳的棋譜：從 reviews 資料夾找最新的一份 (by time created)
+            # (one list request; the listing already carries time_created)
+            reviews_prefix = _target_paths(target_id).reviews_prefix
+            latest_sgf_path = await get_latest_file(reviews_prefix, suffix=".sgf")
+
+        if not latest_sgf_path:
             used_reply_token = await send_message(
                 target_id,
                 reply_token,
@@ -494,18 +799,6 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
             )
             return
 
-        # Get the latest SGF file by time created
-        def get_latest_sgf():
-            sgf_blobs = [bucket.blob(f) for f in sgf_files]
-            # Reload to get time_created metadata
-            for blob in sgf_blobs:
-                blob.reload()
-            # Sort by time created (newest first) and get the latest
-            latest_blob = max(sgf_blobs, key=lambda b: b.time_created)
-            return latest_blob.name
-
-        latest_sgf_path = await asyncio.to_thread(get_latest_sgf)
-
         # Ensure it's a GCS path
         if not latest_sgf_path.startswith("gs://"):
             sgf_gcs_path = f"gs://{config['gcs']['bucket_name']}/{latest_sgf_path}"
@@ -517,7 +810,7 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
         # Extract timestamp from the filename
         filename = os.path.basename(latest_sgf_path)
         # Match pattern: name_timestamp.sgf where timestamp is digits
-        timestamp_match = re.search(r"_(\d+)\.sgf$", filename)
+        timestamp_match = _SGF_TIMESTAMP_RE.search(filename)
         if timestamp_match:
             task_id = timestamp_match.group(1)
         else:
@@ -560,7 +853,7 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
         if sgf_file_name.lower().endswith(".sgf"):
             # Remove timestamp from filename (format: name_timestamp.sgf -> name.sgf)
             # Match pattern: name_timestamp.sgf where timestamp is digits
-            sgf_file_name = re.sub(r"_(\d+)\.sgf$", r".sgf", sgf_file_name)
+            sgf_file_name = _SGF_TIMESTAMP_RE.sub(".sgf", sgf_file_name)
             # Remove .sgf extension for display
             sgf_file_name = sgf_file_name[:-4]
         else:
@@ -582,19 +875,19 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
 
         # POST review request to localhost service
         logger.info(f"Posting review request to localhost: {localhost_url}")
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                localhost_url,
-                json={
-                    "task_id": task_id,
-                    "sgf_gcs_path": sgf_gcs_path,
-                    "callback_url": callback_review_url,
-                    "target_id": target_id,
-                    "visits": 5,
-                },
-            )
-            response.raise_for_status()
-            logger.info(f"Successfully posted review request: {response.status_code}")
+        response = await _http_client.post(
+            localhost_url,
+            json={
+                "task_id": task_id,
+                "sgf_gcs_path": sgf_gcs_path,
+                "callback_url": callback_review_url,
+                "target_id": target_id,
+                "visits": 5,
+            },
+            timeout=30.0,
+        )
+        response.raise_for_status()
+        logger.info(f"Successfully posted review request: {response.status_code}")
 
         # Review will continue asynchronously via callback
         # No need to wait here
@@ -609,10 +902,6 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
 
 async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
     """Handle shape evaluation command (形勢判斷 / evaluation)"""
-    import httpx
-    import tempfile
-    from pathlib import Path
-
     try:
         state = await get_game_state(target_id)
         game = state["game"]
@@ -658,18 +947,18 @@ async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
 
         # POST evaluation request to localhost service
         logger.info(f"Posting evaluation request to localhost: {localhost_url}")
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                localhost_url,
-                json={
-                    "sgf_gcs_path": sgf_gcs_path,
-                    "current_turn": current_turn,
-                    "visits": 1000,
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
-            logger.info(f"Successfully received evaluation result")
+        response = await _http_client.post(
+            localhost_url,
+            json={
+                "sgf_gcs_path": sgf_gcs_path,
+                "current_turn": current_turn,
+                "visits": 1000,
+            },
+            timeout=300.0,
+        )
+        response.raise_for_status()
+        result = response.json()
+        logger.info(f"Successfully received evaluation result")
 
         if not result.get("success"):
             error = result.get("error", "Unknown error")
@@ -707,69 +996,51 @@ async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
                 shape_text = f"目前形勢：{leader} +{lead_rounded:.1f} 目。"
 
         # 從 SGF 找最後一手座標，保持 last move 高亮
-        last_coords = None
-        sequence = sgf_game.get_main_sequence()
-        for node in sequence:
-            color, move = node.get_move()
-            if move is not None:
-                sgf_r, sgf_c = move
-                r = 18 - sgf_r
-                c = sgf_c
-                last_coords = (r, c)
+        last_coords = last_move_from_sgf(sgf_game)
 
         # Draw board with territory overlay
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            filename = f"evaluation_{target_id}_{int(time.time())}.png"
-            output_path = temp_path / filename
-
-            visualizer.draw_board(
-                game.board,
-                last_move=last_coords,
-                output_filename=str(output_path),
-                territory=territory,
-            )
+        filename = f"evaluation_{target_id}_{int(time.time())}.png"
 
-            # Upload image to GCS
-            from services.storage import upload_buffer
-            game_id = await get_game_id(target_id)
-            remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
-            
-            with open(output_path, "rb") as f:
-                image_bytes = f.read()
+        png_bytes = render_board_png(
+            game.array, last_move=last_coords, territory=territory
+        )
+
+        # Upload image to GCS
+        game_id = await get_game_id(target_id)
+        remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/{filename}"
             
-            gcs_path = await upload_buffer(
-                image_bytes,
-                remote_path,
-                content_type="image/png",
-                cache_control="no-cache, max-age=0",
-            )
+        gcs_path = await upload_buffer(
+            png_bytes,
+            remote_path,
+            content_type="image/png",
+            cache_control="no-cache, max-age=0",
+        )
 
-            # Get public URL for image
-            public_url = config.get("server", {}).get("public_url")
-            if public_url and gcs_path:
-                # Extract path from gs://bucket/path
-                if gcs_path.startswith("gs://"):
-                    parts = gcs_path[5:].split("/", 1)
-                    image_path = parts[1] if len(parts) > 1 else ""
-                else:
-                    image_path = gcs_path
+        # Get public URL for image
+        public_url = config.get("server", {}).get("public_url")
+        if public_url and gcs_path:
+            # Extract path from gs://bucket/path
+            if gcs_path.startswith("gs://"):
+                parts = gcs_path[5:].split("/", 1)
+                image_path = parts[1] if len(parts) > 1 else ""
+            else:
+                image_path = gcs_path
                 
-                # Construct public URL (assuming GCS public URL structure)
-                # This depends on your GCS bucket configuration
-                bucket_name = config.get("gcs", {}).get("bucket_name")
-                if bucket_name:
-                    image_url = f"{public_url}/{image_path}"
-                    messages = [
-                        TextMessage(text=shape_text),
-                        TextMessage(text="下圖勢力範圍僅供參考"),
-                        ImageMessage(
-                            original_content_url=image_url,
-                            preview_image_url=image_url,
-                        ),
-                    ]
-                    await send_message(target_id, reply_token, messages)
-                    return
+            # Construct public URL (assuming GCS public URL structure)
+            # This depends on your GCS bucket configuration
+            bucket_name = config.get("gcs", {}).get("bucket_name")
+            if bucket_name:
+                image_url = f"{public_url}/{image_path}"
+                messages = [
+                    TextMessage(text=shape_text),
+                    TextMessage(text="下圖勢力範圍僅供參考"),
+                    ImageMessage(
+                        original_content_url=image_url,
+                        preview_image_url=image_url,
+                    ),
+                ]
+                await send_message(target_id, reply_token, messages)
+                return
 
         # Fallback: text only
         await send_message(
@@ -786,6 +1057,11 @@ async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
         )
 
 
+def _new_game_id() -> str:
+    """Generate a new game ID (timestamp-based)"""
+    return f"game_{int(time.time())}"
+
+
 async def get_game_id(target_id: str) -> str:
     """Get or create game ID for a target (user/group/room)
     Game ID is a unique identifier for each game session.
@@ -795,11 +1071,10 @@ async def get_game_id(target_id: str) -> str:
         return state["game_id"]
 
     # Generate new game ID (timestamp-based)
-    new_game_id = f"game_{int(time.time())}"
+    new_game_id = _new_game_id()
     # Save to GCS, preserving existing fields like vs_ai_mode
-    existing_state = await load_state_from_gcs(target_id)
-    if existing_state is None:
-        existing_state = {}
+    # (剛剛已經讀過 state，不必再讀一次)
+    existing_state = state if state is not None else {}
     existing_state["game_id"] = new_game_id
     existing_state["current_turn"] = 1
     await save_state_to_gcs(target_id, existing_state)
@@ -858,20 +1133,40 @@ async def get_game_state(target_id: str) -> Dict[str, Any]:
 
     Loads from GCS: tries to restore from latest SGF file, or creates a new game.
     """
+    # 取出 (並移除) 快取的棋局：呼叫端會直接修改這個 state，
+    # 要等 save_game_sgf 存檔成功後才會帶著新的 generation 放回快取
+    cached = _game_state_cache.pop(target_id, None)
+
+    # 有快取時 game_id 多半沒變：SGF 的條件式下載和 metadata 同時送出，
+    # 不用等 metadata 回來才開始 (game_id 變了就丟掉這個結果重新下載)
+    sgf_task = None
+    if cached:
+        sgf_task = asyncio.create_task(
+            download_file_if_modified(cached[0], cached[1])
+        )
+
     # Load state metadata from GCS
     state_meta = await load_state_from_gcs(target_id)
 
     if state_meta and "game_id" in state_meta:
         game_id = state_meta["game_id"]
         # Try to load SGF from GCS
-        from services.storage import download_file, file_exists
-
-        sgf_remote_path = f"target_{target_id}/boards/{game_id}/game.sgf"
-        if await file_exists(sgf_remote_path):
+        sgf_remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/game.sgf"
+        if sgf_task is not None and cached[0] == sgf_remote_path:
+            sgf_bytes, generation = await sgf_task
+        else:
+            if sgf_task is not None:
+                _discard_task(sgf_task)
+            cached = None
+            sgf_bytes, generation = await download_file_if_modified(sgf_remote_path)
+        if generation is not None:
             try:
-                sgf_bytes = await download_file(sgf_remote_path)
-                sgf_game = sgf.Sgf_game.from_bytes(sgf_bytes)
-                restored = restore_game_from_sgf_object(sgf_game)
+                if sgf_bytes is None:
+                    # SGF 沒有變：沿用快取的棋局，不必重新解析 SGF、重下每一手
+                    restored = cached[2]
+                else:
+                    sgf_game = sgf.Sgf_game.from_bytes(sgf_bytes)
+                    restored = restore_game_from_sgf_object(sgf_game)
                 if restored:
                     # Use current_turn from SGF restoration (it's calculated from moves)
                     # Only use metadata as fallback if SGF restoration didn't provide it
@@ -898,20 +1193,39 @@ async def get_game_state(target_id: str) -> Dict[str, Any]:
                 logger.warning(
                     f"Failed to restore from GCS SGF for {target_id}: {error}"
                 )
+    elif sgf_task is not None:
+        _discard_task(sgf_task)
 
     # Create new game
-    game_id = await get_game_id(target_id)
+    # game ID 等第一次 save_game_sgf 時跟 state 一起寫入 (需要的呼叫端會自己 get_game_id)，
+    # 這裡不先另外存一次
     new_state = {
         "game": GoBoard(),
         "current_turn": 1,  # 1=黑, 2=白
         "sgf_game": sgf.Sgf_game(size=19),
+        "move_count": 0,
     }
     logger.info(f"Created new game state for {target_id}")
     return new_state
 
 
+def last_move_from_sgf(sgf_game: sgf.Sgf_game) -> Optional[Tuple[int, int]]:
+    """Return engine coordinates (row, col) of the last move in the main sequence"""
+    # 從最後一個節點往回找，通常第一個節點就是最後一手
+    for node in reversed(sgf_game.get_main_sequence()):
+        move = node.get_move()[1]
+        if move is not None:
+            # move is (sgf_row, sgf_col), where sgf_row 0 is bottom
+            sgf_r, sgf_c = move
+            return 18 - sgf_r, sgf_c
+    return None
+
+
 def restore_game_from_sgf_object(sgf_game: sgf.Sgf_game) -> Optional[Dict[str, Any]]:
     """Restore game state from an SGF game object"""
+    # 每一手的 debug 訊息先收集起來，最後 (或出錯時) 合併成一筆 log 輸出；
+    # 沒開 DEBUG 時為 None，完全不組字串
+    trace: Optional[List[str]] = [] if logger.isEnabledFor(logging.DEBUG) else None
     try:
         # Rebuild board state from SGF
         game = GoBoard()
@@ -937,15 +1251,25 @@ def restore_game_from_sgf_object(sgf_game: sgf.Sgf_game) -> Optional[Dict[str, A
         sequence = sgf_game.get_main_sequence()
         logger.debug(f"SGF main sequence has {len(sequence)} nodes")
         
+        # 之前還原過這個 SGF 物件時，從最後一份盤面快照接著下，不必從第一手開始
+        start = 0
+        for idx in range(len(sequence) - 1, 0, -1):
+            snapshot = _node_board_cache.get(sequence[idx])
+            if snapshot is not None:
+                board, move_count, current_turn = snapshot
+                game = board.copy()
+                start = idx + 1
+                break
+
         # Variables to store last move info
         last_move_info = None
-
-        for node_idx, node in enumerate(sequence):
+        for node_idx, node in enumerate(sequence[start:], start):
             color, move = node.get_move()
 
             # Log all nodes, even if they don't have moves
             if move is None:
-                logger.debug(f"Node {node_idx}: no move (color={color}, move={move})")
+                if trace is not None:
+                    trace.append(f"Node {node_idx}: no move (color={color}, move={move})")
                 continue
 
             move_count += 1
@@ -973,14 +1297,7 @@ def restore_game_from_sgf_object(sgf_game: sgf.Sgf_game) -> Optional[Dict[str, A
                 stone_val = 1 if color == "b" else 2
 
             # Store last move info (will be logged after loop)
-            last_move_info = {
-                "move_count": move_count,
-                "color": color,
-                "stone_val": stone_val,
-                "r": r,
-                "c": c,
-                "expected_turn": current_turn
-            }
+            last_move_info = (move_count, color, stone_val, r, c, current_turn)
 
             # Check if position is already occupied (shouldn't happen in valid SGF, but handle it)
             if game.board[r][c] != 0:
@@ -991,59 +1308,39 @@ def restore_game_from_sgf_object(sgf_game: sgf.Sgf_game) -> Optional[Dict[str, A
                 )
                 # Continue anyway - overwrite (this might be intentional in some SGF formats)
 
-            # Use the same logic as place_stone to ensure consistency
-            # 1. Place stone temporarily
-            game.board[r][c] = stone_val
-
-            # 2. Check for captured opponent stones
-            opponent = 2 if stone_val == 1 else 1
-            captured_stones = set()  # Use set to avoid duplicates
-            neighbors = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
-            for nr, nc in neighbors:
-                if 0 <= nr < 19 and 0 <= nc < 19:
-                    if game.board[nr][nc] == opponent:
-                        group, libs = game.get_group_and_liberties(nr, nc)
-                        if libs == 0:
-                            # Add all stones in the captured group
-                            captured_stones.update(group)
-                            logger.debug(
-                                f"Move {move_count}: Capturing {len(group)} stones at group starting from ({nr}, {nc})"
-                            )
-
-            # 3. Remove captured stones
-            if captured_stones:
-                logger.info(
+            # Place the stone with the engine's replay logic (captures + ko,
+            # no legality checks) so the board's bitboards stay consistent
+            captured_stones, my_libs = game.replay_stone(r, c, stone_val)
+            if captured_stones and trace is not None:
+                trace.append(
                     f"Move {move_count}: Removing {len(captured_stones)} captured stones"
                 )
-            for cr, cc in captured_stones:
-                game.board[cr][cc] = 0
 
-            # 4. Check for suicide (shouldn't happen in valid SGF, but we check anyway)
-            my_group, my_libs = game.get_group_and_liberties(r, c)
+            # Check for suicide (shouldn't happen in valid SGF, but we check anyway)
             if my_libs == 0 and len(captured_stones) == 0:
                 # Suicide move - this shouldn't happen in valid SGF, but restore it anyway
                 logger.warning(
                     f"Move {move_count}: Suicide move detected at ({r}, {c}) in SGF, keeping it for restoration"
                 )
 
-            # 5. Update ko point
-            if len(captured_stones) == 1 and my_libs == 1:
-                # Get the single captured stone position
-                captured_pos = list(captured_stones)[0]
-                game.ko_point = captured_pos
-                logger.debug(f"Move {move_count}: Ko point set to {captured_pos}")
-            else:
-                game.ko_point = None
+            if trace is not None and game.ko_point >= 0:
+                trace.append(
+                    f"Move {move_count}: Ko point set to {divmod(game.ko_point, game.size)}"
+                )
 
             # Switch turn for next move
             current_turn = 2 if stone_val == 1 else 1
 
+            if move_count % _SNAPSHOT_INTERVAL == 0:
+                _node_board_cache[node] = (game.copy(), move_count, current_turn)
+
         # Log only the last move
         if last_move_info:
+            last_count, last_color, last_stone_val, last_r, last_c, expected_turn = last_move_info
             logger.info(
-                f"Restoring move {last_move_info['move_count']}: color={last_move_info['color']}, "
-                f"stone_val={last_move_info['stone_val']}, pos=({last_move_info['r']},{last_move_info['c']}), "
-                f"expected_turn={last_move_info['expected_turn']}"
+                f"Restoring move {last_count}: color={last_color}, "
+                f"stone_val={last_stone_val}, pos=({last_r},{last_c}), "
+                f"expected_turn={expected_turn}"
             )
 
         logger.info(
@@ -1054,10 +1351,14 @@ def restore_game_from_sgf_object(sgf_game: sgf.Sgf_game) -> Optional[Dict[str, A
             "game": game,
             "current_turn": current_turn,
             "sgf_game": sgf_game,
+            "move_count": move_count,  # 盤上下過的手數 (pass 不算)
         }
     except Exception as error:
         logger.error(f"Failed to restore game from SGF object: {error}", exc_info=True)
         return None
+    finally:
+        if trace:
+            logger.debug("SGF restore trace:\n%s", "\n".join(trace))
 
 
 def restore_game_from_sgf_file(sgf_path: str) -> Optional[Dict[str, Any]]:
@@ -1122,32 +1423,41 @@ async def save_game_sgf(
     current_turn = state.get("current_turn", 1)
 
     try:
-        from services.storage import upload_buffer
-
-        # Get or create game ID
-        game_id = await get_game_id(target_id)
+        # Load state metadata once: it has the game ID and the fields to preserve
+        # (like vs_ai_mode); only create a new game ID when there is none yet
+        existing_state = await load_state_from_gcs(target_id)
+        if existing_state is None:
+            existing_state = {}
+        game_id = existing_state.get("game_id")
+        if not game_id:
+            # 新的 game ID 跟著下面的 save_state_to_gcs 一起寫入，
+            # 不另外透過 get_game_id 先存一次
+            game_id = _new_game_id()
+            logger.info(f"Created new game ID for {target_id}: {game_id}")
 
         # Use fixed filename for the same game
         filename = "game.sgf"
-        remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
+        remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/{filename}"
 
-        # Serialize SGF and upload to GCS
+        # Serialize SGF
         sgf_bytes = sgf_game.serialise()
-        # 設定快取控制：no-cache 確保每次都要回源伺服器檢查，避免快取問題
-        gcs_path = await upload_buffer(
-            sgf_bytes,
-            remote_path,
-            content_type="application/x-go-sgf",
-            cache_control="no-cache, max-age=0",
-        )
 
-        # Save state metadata to GCS, preserving existing fields like vs_ai_mode
-        existing_state = await load_state_from_gcs(target_id)
-        if existing_state is None:
-            existing_state = {}
+        # Upload SGF and save state metadata concurrently (independent GCS writes)
         existing_state["game_id"] = game_id
         existing_state["current_turn"] = current_turn
-        await save_state_to_gcs(target_id, existing_state)
+        # 設定快取控制：no-cache 確保每次都要回源伺服器檢查，避免快取問題
+        (gcs_path, generation), _ = await asyncio.gather(
+            upload_buffer_with_generation(
+                sgf_bytes,
+                remote_path,
+                content_type="application/x-go-sgf",
+                cache_control="no-cache, max-age=0",
+                gzip_encode=True,
+            ),
+            save_state_to_gcs(target_id, existing_state),
+        )
+        # GCS 上的 SGF 就是這個 state 序列化的結果，放回快取給下一次 get_game_state
+        _cache_put(_game_state_cache, target_id, (remote_path, generation, state))
 
         logger.info(f"Saved/Updated game SGF to {gcs_path}")
         return gcs_path
@@ -1156,6 +1466,18 @@ async def save_game_sgf(
         return None
 
 
+async def game_sgf_exists(target_id: str, sgf_remote_path: str) -> bool:
+    """Check whether a game's SGF exists in GCS
+
+    這個 instance 剛讀過 / 寫過同一個 SGF 時 (快取裡有它的 generation) 就不必再問 GCS；
+    棋局的 SGF 不會被刪除，所以快取裡有就代表檔案存在
+    """
+    cached = _game_state_cache.get(target_id)
+    if cached and cached[0] == sgf_remote_path:
+        return True
+    return await file_exists(sgf_remote_path)
+
+
 async def reset_game_state(target_id: str, reply_token: Optional[str] = None):
     """Reset game state for a target and create new game ID
 
@@ -1164,7 +1486,8 @@ async def reset_game_state(target_id: str, reply_token: Optional[str] = None):
         reply_token: Optional reply token (not used, kept for compatibility)
     """
     # Generate new game ID for new game
-    new_game_id = f"game_{int(time.time())}"
+    new_game_id = _new_game_id()
+    _game_state_cache.pop(target_id, None)
 
     # Save new state metadata to GCS, preserving existing fields like vs_ai_mode
     existing_state = await load_state_from_gcs(target_id)
@@ -1177,16 +1500,16 @@ async def reset_game_state(target_id: str, reply_token: Optional[str] = None):
 
     # Save empty SGF to GCS
     new_sgf = sgf.Sgf_game(size=19)
-    from services.storage import upload_buffer
 
     sgf_bytes = new_sgf.serialise()
-    remote_path = f"target_{target_id}/boards/{new_game_id}/game.sgf"
+    remote_path = f"{_target_paths(target_id).boards_prefix}{new_game_id}/game.sgf"
     # 設定快取控制：no-cache 確保每次都要回源伺服器檢查，避免快取問題
     await upload_buffer(
         sgf_bytes,
         remote_path,
         content_type="application/x-go-sgf",
         cache_control="no-cache, max-age=0",
+        gzip_encode=True,
     )
 
     logger.info(f"Reset game state for {target_id}, new game ID: {new_game_id}")
@@ -1212,7 +1535,7 @@ async def handle_board_move(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"提示：{msg}")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         # Successfully placed stone
@@ -1233,41 +1556,35 @@ async def handle_board_move(
 
         # --- 2. Switch turn and update state ---
         state["current_turn"] = 2 if current_turn == 1 else 1
+        state["move_count"] = state.get("move_count", 0) + 1
 
-        # Save SGF file and state metadata
-        sgf_path = await save_game_sgf(target_id, state)
-        if sgf_path:
-            logger.info(f"Saved game SGF: {sgf_path}")
-
-        # Generate board image
-        import tempfile
-        from services.storage import upload_file, get_public_url
-
-        # Get game ID
+        # Get game ID (the board image path needs it before the SGF is saved)
         game_id = await get_game_id(target_id)
 
-        timestamp = int(time.time())
-        filename = f"board_{timestamp}.png"
+        # Save SGF file and state metadata
+        # SGF 和棋盤圖片是互不相關的 GCS 上傳：先送出 SGF，畫圖的同時它已經在傳，
+        # 再跟圖片上傳一起等
+        sgf_task = asyncio.create_task(save_game_sgf(target_id, state))
 
-        # Draw board to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-            tmp_path = tmp_file.name
+        # 檔名帶上手數：同一秒內下了兩手 (例如群組裡兩個人幾乎同時落子) 也不會互相覆蓋
+        timestamp = int(time.time())
+        filename = f"board_{state['move_count']:03d}_{timestamp}.png"
 
-        visualizer.draw_board(game.board, last_move=coords, output_filename=tmp_path)
+        # Draw board in memory (no temporary file)
+        png_bytes = render_board_png(game.array, last_move=coords)
 
         # Upload to GCS
-        remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
-        await upload_file(tmp_path, remote_path)
+        remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/{filename}"
+        sgf_path, _ = await asyncio.gather(
+            sgf_task,
+            upload_buffer(png_bytes, remote_path, content_type="image/png"),
+        )
+        if sgf_path:
+            logger.info(f"Saved game SGF: {sgf_path}")
 
         # Get public URL
         image_url = get_public_url(remote_path)
 
-        # Clean up temporary file
-        try:
-            os.unlink(tmp_path)
-        except:
-            pass
-
         # Check if VS AI mode is enabled
         vs_ai_mode = await is_vs_ai_mode(target_id)
         
@@ -1291,24 +1608,22 @@ async def handle_board_move(
                             ai_current_turn = state["current_turn"]
                             
                             # Call localhost KataGo service asynchronously
-                            import httpx
-                            
                             async def call_katago_async():
                                 try:
-                                    async with httpx.AsyncClient(timeout=60.0) as client:
-                                        response = await client.post(
-                                            f"{localhost_url}/get_ai_next_move",
-                                            json={
-                                                "sgf_gcs_path": sgf_gcs_path,
-                                                "callback_url": callback_get_ai_next_move_url,
-                                                "target_id": target_id,
-                                                "current_turn": ai_current_turn,
-                                                "reply_token": reply_token,
-                                                "user_board_image_url": image_url,
-                                            },
-                                        )
-                                        response.raise_for_status()
-                                        logger.info(f"Successfully called localhost KataGo service for VS AI: target_id={target_id}, current_turn={ai_current_turn}")
+                                    response = await _http_client.post(
+                                        f"{localhost_url}/get_ai_next_move",
+                                        json={
+                                            "sgf_gcs_path": sgf_gcs_path,
+                                            "callback_url": callback_get_ai_next_move_url,
+                                            "target_id": target_id,
+                                            "current_turn": ai_current_turn,
+                                            "reply_token": reply_token,
+                                            "user_board_image_url": image_url,
+                                        },
+                                        timeout=60.0,
+                                    )
+                                    response.raise_for_status()
+                                    logger.info(f"Successfully called localhost KataGo service for VS AI: target_id={target_id}, current_turn={ai_current_turn}")
                                 except Exception as http_error:
                                     logger.error(f"Error calling localhost KataGo service for VS AI: {http_error}", exc_info=True)
                             
@@ -1333,7 +1648,7 @@ async def handle_board_move(
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
         else:
             logger.warning(f"Invalid image URL: {image_url}")
             request = ReplyMessageRequest(
@@ -1344,7 +1659,7 @@ async def handle_board_move(
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling board move: {error}", exc_info=True)
@@ -1352,7 +1667,7 @@ async def handle_board_move(
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 處理落子時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_undo_move(target_id: str, reply_token: Optional[str]):
@@ -1372,12 +1687,13 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="目前是初始狀態，無法悔棋。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         try:
             # Delete last move from SGF
             last_node.delete()
+            _node_board_cache.pop(last_node, None)
 
             # Restore game state directly from updated SGF object
             restored = restore_game_from_sgf_object(sgf_game)
@@ -1392,50 +1708,40 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                     "game": GoBoard(),
                     "current_turn": 1,
                     "sgf_game": sgf.Sgf_game(size=19),
+                    "move_count": 0,
                 }
 
+            # Get game ID (the board image path needs it before the SGF is saved)
+            game_id = await get_game_id(target_id)
+
             # Save updated SGF to GCS after restoring state
-            await save_game_sgf(target_id, state)
+            # 跟 handle_board_move 一樣：SGF 先開始上傳，畫圖、上傳圖片時一起進行，
+            # 回覆前兩者都已完成 (下一則訊息一定讀得到悔棋後的 SGF)
+            sgf_task = asyncio.create_task(save_game_sgf(target_id, state))
 
             game = state["game"]
             current_turn = state["current_turn"]
 
             # Find last move coordinates for highlighting
-            last_coords = None
-            for r in range(19):
-                for c in range(19):
-                    if game.board[r][c] != 0:
-                        last_coords = (r, c)
+            last_coords = last_move_from_sgf(state["sgf_game"])
 
             # Draw board
-            import tempfile
-            from services.storage import upload_file, get_public_url
-
-            game_id = await get_game_id(target_id)
             timestamp = int(time.time())
             filename = f"board_undo_{timestamp}.png"
 
-            # Draw board to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-
-            visualizer.draw_board(
-                game.board, last_move=last_coords, output_filename=tmp_path
-            )
+            # Draw board in memory (no temporary file)
+            png_bytes = render_board_png(game.array, last_move=last_coords)
 
             # Upload to GCS
-            remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
-            await upload_file(tmp_path, remote_path)
+            remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/{filename}"
+            await asyncio.gather(
+                sgf_task,
+                upload_buffer(png_bytes, remote_path, content_type="image/png"),
+            )
 
             # Get public URL
             image_url = get_public_url(remote_path)
 
-            # Clean up temporary file
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-
             turn_text = "黑" if current_turn == 1 else "白"
 
             if is_valid_https_url(image_url):
@@ -1449,7 +1755,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                         ),
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
             else:
                 request = ReplyMessageRequest(
                     reply_token=reply_token,
@@ -1459,7 +1765,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
 
         except Exception as e:
             logger.error(f"Error undoing move: {e}", exc_info=True)
@@ -1467,7 +1773,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"悔棋失敗：{str(e)}")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling undo move: {error}", exc_info=True)
@@ -1475,7 +1781,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 處理悔棋時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_load_game_by_id(
@@ -1494,24 +1800,21 @@ async def handle_load_game_by_id(
                     reply_token=reply_token,
                     messages=[TextMessage(text="找不到存檔。")],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
                 return
             game_id = state_meta["game_id"]
 
         # Load SGF from GCS using the game_id
-        from services.storage import download_file, file_exists, get_public_url
-
-        sgf_remote_path = f"target_{target_id}/boards/{game_id}/game.sgf"
-        if not await file_exists(sgf_remote_path):
+        sgf_remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/game.sgf"
+        # 直接下載；檔案不存在時回傳 None，省掉先查 file_exists 的一次來回
+        sgf_bytes, _ = await download_file_if_modified(sgf_remote_path)
+        if sgf_bytes is None:
             request = ReplyMessageRequest(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"找不到 game_id 為 {game_id} 的棋譜。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
-
-        # Download and restore game state
-        sgf_bytes = await download_file(sgf_remote_path)
         sgf_game = sgf.Sgf_game.from_bytes(sgf_bytes)
         restored = restore_game_from_sgf_object(sgf_game)
 
@@ -1520,7 +1823,7 @@ async def handle_load_game_by_id(
                 reply_token=reply_token,
                 messages=[TextMessage(text="讀取失敗：無法解析棋譜檔案。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         state = restored
@@ -1543,48 +1846,22 @@ async def handle_load_game_by_id(
 
         # Find last move coordinates for highlighting
         # Get the last move from SGF sequence instead of traversing the board
-        last_coords = None
-        sequence = sgf_game.get_main_sequence()
-        # Traverse sequence backwards to find the last move
-        for node in reversed(sequence):
-            color, move = node.get_move()
-            if move is not None:
-                # move is (sgf_row, sgf_col), where sgf_row 0 is bottom
-                sgf_r, sgf_c = move
-                # Convert to engine coordinates (row 0 is top)
-                r = 18 - sgf_r
-                c = sgf_c
-                last_coords = (r, c)
-                break  # Found the last move, exit loop
+        last_coords = last_move_from_sgf(sgf_game)
 
         # Draw board
-        import tempfile
-        from services.storage import upload_file
-
         timestamp = int(time.time())
         filename = f"board_restored_{timestamp}.png"
 
-        # Draw board to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-            tmp_path = tmp_file.name
-
-        visualizer.draw_board(
-            game.board, last_move=last_coords, output_filename=tmp_path
-        )
+        # Draw board in memory (no temporary file)
+        png_bytes = render_board_png(game.array, last_move=last_coords)
 
         # Upload to GCS
-        remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
-        await upload_file(tmp_path, remote_path)
+        remote_path = f"{_target_paths(target_id).boards_prefix}{game_id}/{filename}"
+        await upload_buffer(png_bytes, remote_path, content_type="image/png")
 
         # Get public URL
         image_url = get_public_url(remote_path)
 
-        # Clean up temporary file
-        try:
-            os.unlink(tmp_path)
-        except:
-            pass
-
         turn_text = "黑" if current_turn == 1 else "白"
 
         # Format message text based on whether game_id was provided
@@ -1604,13 +1881,13 @@ async def handle_load_game_by_id(
                     ),
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
         else:
             request = ReplyMessageRequest(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"{message_text}\n\n⚠️ 圖片 URL 無效")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling load game by ID: {error}", exc_info=True)
@@ -1618,7 +1895,7 @@ async def handle_load_game_by_id(
             reply_token=reply_token,
             messages=[TextMessage(text=f"讀取失敗：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_text_message(event: Dict[str, Any]):
@@ -1634,10 +1911,7 @@ async def handle_text_message(event: Dict[str, Any]):
         bot_display_name = await get_bot_display_name()
         text_mention_matched = False
         if bot_display_name:
-            # Escape special regex characters in bot display name
-            escaped_display_name = re.escape(bot_display_name)
-            text_mention_pattern = rf"^@{escaped_display_name}\s+(.+)$"
-            text_mention_match = re.match(text_mention_pattern, text, re.IGNORECASE)
+            text_mention_match = _text_mention_re(bot_display_name).match(text)
             
             if text_mention_match:
                 # Extract command after @{bot_display_name}
@@ -1671,43 +1945,56 @@ async def handle_text_message(event: Dict[str, Any]):
                 return
 
             # Remove mention markers to get actual command
-            clean_text = text
-            # Sort mentions by index descending to avoid index position changes
-            for mention_obj in sorted(
-                mentions, key=lambda x: x.get("index", 0), reverse=True
-            ):
+            # 依 index 由前往後掃一次，只收集 mention 之間的文字，最後 join 一次
+            parts = []
+            cursor = 0
+            for mention_obj in sorted(mentions, key=lambda x: x.get("index", 0)):
                 index = mention_obj.get("index", 0)
                 length = mention_obj.get("length", 0)
-                clean_text = clean_text[:index] + clean_text[index + length :]
+                if index > cursor:
+                    parts.append(text[cursor:index])
+                cursor = max(cursor, index + length)
+            parts.append(text[cursor:])
 
-            text = clean_text.strip()
+            text = "".join(parts).strip()
 
     # Get target ID for game state management
     target_id = source.get("groupId") or source.get("roomId") or source.get("userId")
 
-    if text in ["help", "幫助", "說明"]:
+    # Check if input is a board coordinate (A-T, 1-19)
+    # (最常見的訊息，先檢查；座標不會跟任何指令重疊)
+    user_text_upper = text.upper().strip()
+
+    if _COORD_RE.match(user_text_upper):
+        # Handle board coordinate input
+        await handle_board_move(target_id, reply_token, user_text_upper, source)
+        return
+
+    command = _parse_command(text)
+
+    if command == "help":
         request = ReplyMessageRequest(
             reply_token=reply_token, messages=[TextMessage(text=HELP_MESSAGE)]
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if text == "覆盤" or text.lower() == "review":
+    if command == "review":
         await handle_review_command(target_id, reply_token)
         return
 
-    if text == "形勢" or text == "形式" or text.lower() == "evaluation":
+    if command == "evaluation":
         await handle_evaluation_command(target_id, reply_token)
         return
 
-    if "悔棋" in text or "undo" in text.lower():
+    if command == "undo":
         await handle_undo_move(target_id, reply_token)
         return
 
-    if "讀取" in text or "load" in text.lower():
+    if command == "load":
         # Match "讀取 game_1234567890" or "讀取game_1234567890" or "load game_1234567890" or "loadgame_1234567890"
         # Ensure we match the full game_id format: game_ followed by digits
-        read_match = re.match(r"(?:讀取|load)\s*(game_\d+)", text, re.IGNORECASE)
+        read_match = _LOAD_GAME_RE.match(text)
         if read_match:
             game_id = read_match.group(1).strip()
             if game_id:  # Make sure game_id is not empty
@@ -1720,7 +2007,7 @@ async def handle_text_message(event: Dict[str, Any]):
         return
 
     # Handle "對弈" to show current mode status
-    if text.lower() in ["對弈", "vs"]:
+    if command == "vs":
         # Check current VS AI mode status
         vs_ai_mode = await is_vs_ai_mode(target_id)
         state_meta = await load_state_from_gcs(target_id)
@@ -1765,11 +2052,11 @@ async def handle_text_message(event: Dict[str, Any]):
             reply_token=reply_token,
             messages=[TextMessage(text=status_message)],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
     # Handle "對弈 ai" to enable VS AI mode
-    if text.lower() in ["對弈 ai", "對弈ai", "vs ai", "vsai"]:
+    if command == "vs_ai":
         # Enable VS AI mode
         success = await enable_vs_ai_mode(target_id)
         if success:
@@ -1792,11 +2079,11 @@ async def handle_text_message(event: Dict[str, Any]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="❌ 開啟對弈模式失敗，請稍後再試。")],
             )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
     # Handle "對弈 free" to disable VS AI mode
-    if text.lower() in ["對弈 free", "對弈free", "vs free", "vsfree"]:
+    if command == "vs_free":
         # Disable VS AI mode
         success = await disable_vs_ai_mode(target_id)
         if success:
@@ -1813,10 +2100,10 @@ async def handle_text_message(event: Dict[str, Any]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="❌ 關閉對弈模式失敗，請稍後再試。")],
             )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if "投子" in text:
+    if command == "resign":
         current_game_id = None
         current_sgf_url = None
         current_turn = 1
@@ -1827,12 +2114,11 @@ async def handle_text_message(event: Dict[str, Any]):
                 current_turn = state_meta.get("current_turn", 1)
                 if "game_id" in state_meta:
                     current_game_id = state_meta["game_id"]
-                    from services.storage import file_exists, get_public_url
 
                     sgf_remote_path = (
-                        f"target_{target_id}/boards/{current_game_id}/game.sgf"
+                        f"{_target_paths(target_id).boards_prefix}{current_game_id}/game.sgf"
                     )
-                    if await file_exists(sgf_remote_path):
+                    if await game_sgf_exists(target_id, sgf_remote_path):
                         current_sgf_url = get_public_url(sgf_remote_path)
         except Exception as error:
             logger.warning(f"Failed to get current SGF before 投子: {error}")
@@ -1855,10 +2141,10 @@ async def handle_text_message(event: Dict[str, Any]):
             reply_token=reply_token,
             messages=messages,
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if "重置" in text or "reset" in text.lower():
+    if command == "reset":
         # Get current game ID and SGF file before reset
         current_game_id = None
         current_sgf_url = None
@@ -1867,12 +2153,11 @@ async def handle_text_message(event: Dict[str, Any]):
             state_meta = await load_state_from_gcs(target_id)
             if state_meta and "game_id" in state_meta:
                 current_game_id = state_meta["game_id"]
-                from services.storage import file_exists, get_public_url
 
                 sgf_remote_path = (
-                    f"target_{target_id}/boards/{current_game_id}/game.sgf"
+                    f"{_target_paths(target_id).boards_prefix}{current_game_id}/game.sgf"
                 )
-                if await file_exists(sgf_remote_path):
+                if await game_sgf_exists(target_id, sgf_remote_path):
                     current_sgf_url = get_public_url(sgf_remote_path)
         except Exception as error:
             logger.warning(f"Failed to get current SGF before reset: {error}")
@@ -1894,18 +2179,9 @@ async def handle_text_message(event: Dict[str, Any]):
             reply_token=reply_token,
             messages=messages,
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    # Check if input is a board coordinate (A-T, 1-19)
-    # Pattern matches coordinates like "D4", "Q16", etc. (skips 'I')
-    coord_pattern = r"^[A-HJ-T]([1-9]|1[0-9])$"
-    user_text_upper = text.upper().strip()
-
-    if re.match(coord_pattern, user_text_upper):
-        # Handle board coordinate input
-        await handle_board_move(target_id, reply_token, user_text_upper, source)
-        return
 
 
 async def handle_file_message(event: Dict[str, Any]):
@@ -1969,11 +2245,11 @@ async def handle_file_message(event: Dict[str, Any]):
                 )
             ],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
     except Exception as error:
         logger.error(f"Error handling file message: {error}", exc_info=True)
         request = ReplyMessageRequest(
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 儲存棋譜時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
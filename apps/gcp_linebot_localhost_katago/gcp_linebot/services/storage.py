@@ -1,5 +1,8 @@
 import asyncio
-from typing import Optional
+import gzip
+from typing import Optional, Tuple
+from urllib.parse import quote
+from google.api_core.exceptions import NotFound, NotModified
 from google.cloud import storage
 from config import config
 
@@ -10,6 +13,9 @@ storage_client = storage.Client(
 
 bucket = storage_client.bucket(config["gcs"]["bucket_name"])
 
+# 公開網址的前綴只跟 bucket 有關，載入時算一次
+_BUCKET_URL_PREFIX = f"https://storage.googleapis.com/{config['gcs']['bucket_name']}/"
+
 
 async def upload_file(
     local_path: str, remote_path: str, cache_control: str | None = None
@@ -24,7 +30,11 @@ async def upload_file(
 
 
 async def upload_buffer(
-    buffer: bytes, remote_path: str, content_type: str = None, cache_control: str = None
+    buffer: bytes,
+    remote_path: str,
+    content_type: str = None,
+    cache_control: str = None,
+    gzip_encode: bool = False,
 ) -> str:
     """Upload Buffer to GCS
 
@@ -33,6 +43,28 @@ async def upload_buffer(
         remote_path: The remote path in GCS
         content_type: Optional content type (e.g., 'application/json')
         cache_control: Optional cache control header (e.g., 'no-cache, max-age=0')
+        gzip_encode: Store the data gzip-compressed with Content-Encoding: gzip
+    """
+    gcs_path, _ = await upload_buffer_with_generation(
+        buffer,
+        remote_path,
+        content_type=content_type,
+        cache_control=cache_control,
+        gzip_encode=gzip_encode,
+    )
+    return gcs_path
+
+
+async def upload_buffer_with_generation(
+    buffer: bytes,
+    remote_path: str,
+    content_type: str = None,
+    cache_control: str = None,
+    gzip_encode: bool = False,
+) -> Tuple[str, int]:
+    """Upload Buffer to GCS and return (gs:// path, new object generation)
+
+    Args: same as upload_buffer
     """
     blob = bucket.blob(remote_path)
 
@@ -41,6 +73,12 @@ async def upload_buffer(
     if cache_control:
         blob.cache_control = cache_control
 
+    # 純文字檔 (例如 SGF) 壓縮後大約只剩 1/5；GCS 會記下 Content-Encoding，
+    # SDK 的 download_as_bytes 會自動解壓，用公開網址下載的一般 HTTP client 也會
+    if gzip_encode:
+        buffer = gzip.compress(buffer)
+        blob.content_encoding = "gzip"
+
     # 上傳時同時指定 content_type 和已設置的 cache_control
     if content_type:
         await asyncio.to_thread(
@@ -49,7 +87,8 @@ async def upload_buffer(
     else:
         await asyncio.to_thread(blob.upload_from_string, buffer)
 
-    return f"gs://{config['gcs']['bucket_name']}/{remote_path}"
+    # 上傳的回應已經帶有新的 generation
+    return f"gs://{config['gcs']['bucket_name']}/{remote_path}", blob.generation
 
 
 async def download_file(remote_path: str) -> bytes:
@@ -60,6 +99,34 @@ async def download_file(remote_path: str) -> bytes:
     return await asyncio.to_thread(lambda: blob.download_as_bytes())
 
 
+async def download_file_if_modified(
+    remote_path: str, generation: Optional[int] = None
+) -> Tuple[Optional[bytes], Optional[int]]:
+    """Download file unless its generation still equals the given one
+
+    Returns:
+        (data, generation)
+        - 檔案有變 (或沒有傳入 generation)：回傳內容與目前的 generation
+        - 檔案沒變：回傳 (None, generation)，呼叫端沿用自己快取的內容
+        - 檔案不存在：回傳 (None, None)
+    """
+    blob = bucket.blob(remote_path)
+
+    def _download():
+        try:
+            # 條件式下載：沒變的話 GCS 回 304，不會傳送檔案內容
+            data = blob.download_as_bytes(if_generation_not_match=generation)
+        except NotModified:
+            return None, generation
+        except NotFound:
+            return None, None
+        # 下載回應的 header 已經帶有 generation，不需要另外查詢
+        return data, blob.generation
+
+    # 在後台線程執行同步下載操作，避免阻塞事件循環
+    return await asyncio.to_thread(_download)
+
+
 async def download_file_as_text(remote_path: str, encoding: str = "utf-8") -> str:
     """Download file from GCS as text using SDK (bypasses public cache)"""
     blob = bucket.blob(remote_path)
@@ -88,9 +155,29 @@ async def list_files(prefix: str) -> list:
     return [blob.name for blob in blobs]
 
 
-async def get_latest_file(prefix: str) -> Optional[str]:
-    """Get the latest file (by time created) with the given prefix"""
-    blobs = await asyncio.to_thread(lambda: list(bucket.list_blobs(prefix=prefix)))
+def _suffix_glob(suffix: str) -> Optional[str]:
+    """把副檔名轉成不分大小寫的 match_glob (".sgf" -> "**.[sS][gG][fF]")
+
+    含有 glob 特殊字元時回傳 None，交給呼叫端自己過濾
+    """
+    if not all(ch.isalnum() or ch in "._-" for ch in suffix):
+        return None
+    return "**" + "".join(
+        f"[{ch.lower()}{ch.upper()}]" if ch.isalpha() else ch for ch in suffix
+    )
+
+
+async def get_latest_file(prefix: str, suffix: Optional[str] = None) -> Optional[str]:
+    """Get the latest file (by time created) with the given prefix (and suffix)"""
+    # 副檔名交給 GCS 端的 match_glob 過濾，不符合的物件不會出現在回應裡
+    match_glob = _suffix_glob(suffix) if suffix else None
+    # list_blobs 的回應已經帶有 time_created，不需要再逐一 reload
+    blobs = await asyncio.to_thread(
+        lambda: list(bucket.list_blobs(prefix=prefix, match_glob=match_glob))
+    )
+    if suffix and match_glob is None:
+        suffix = suffix.lower()
+        blobs = [b for b in blobs if b.name.lower().endswith(suffix)]
     if not blobs:
         return None
 
@@ -99,18 +186,28 @@ async def get_latest_file(prefix: str) -> Optional[str]:
     return latest_blob.name
 
 
+# 一個 GCS batch request 最多 100 個子請求
+_DELETE_BATCH_SIZE = 100
+
+
+def _delete_blobs_batched(blobs: list):
+    """Delete blobs using GCS batch requests (one HTTP round trip per 100 blobs)"""
+    for start in range(0, len(blobs), _DELETE_BATCH_SIZE):
+        # batch 區塊內的 delete 只會先排進佇列，離開 with 時才合併成一個請求送出
+        with storage_client.batch():
+            for blob in blobs[start : start + _DELETE_BATCH_SIZE]:
+                blob.delete()
+
+
 async def delete_folder(prefix: str):
     """Delete all files in a folder (with the given prefix)"""
     blobs = await asyncio.to_thread(lambda: list(bucket.list_blobs(prefix=prefix)))
     # Delete all blobs in the folder
-    for blob in blobs:
-        await asyncio.to_thread(lambda b=blob: b.delete())
+    if blobs:
+        await asyncio.to_thread(_delete_blobs_batched, blobs)
 
 
 def get_public_url(remote_path: str) -> str:
     """Get public URL for a file in GCS"""
-    bucket_name = config["gcs"]["bucket_name"]
-    from urllib.parse import quote
-
     encoded_path = "/".join(quote(part, safe="") for part in remote_path.split("/"))
-    return f"https://storage.googleapis.com/{bucket_name}/{encoded_path}"
+    return _BUCKET_URL_PREFIX + encoded_path
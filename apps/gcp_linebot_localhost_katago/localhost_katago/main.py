@@ -1,18 +1,34 @@
 import os
 import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from config import config
 from logger import logger
-from handlers.katago_handler import run_katago_analysis, run_katago_gtp_next_move, run_katago_analysis_evaluation
+from handlers.katago_handler import (
+    run_katago_analysis,
+    run_katago_gtp_next_move,
+    run_katago_analysis_evaluation,
+    close_gtp_engines,
+)
 import httpx
 import tempfile
 
 
-app = FastAPI(title="Localhost Review Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan event handler for startup and shutdown"""
+    yield
+
+    # Shutdown: 結束常駐的 KataGo GTP 行程
+    await close_gtp_engines()
+
+
+app = FastAPI(title="Localhost Review Service", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -2,7 +2,10 @@ import os
 import sys
 import json
 import asyncio
+import threading
 from pathlib import Path
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Optional
 from PIL import Image, ImageDraw, ImageFont
 import imageio
@@ -11,168 +14,239 @@ from handlers.sgf_handler import get_top_winrate_diff_moves
 
 
 # 围棋坐标转换
-def gtp_to_coord(gtp_coord):
-    """将 GTP 坐标（如 'Q16'）转换为 (x, y) 坐标（0-18）"""
-    if not gtp_coord or len(gtp_coord) < 2:
-        return None
-    letter = gtp_coord[0].upper()
-    number = int(gtp_coord[1:])
-
-    # A-T (跳过 I)
-    if letter < "I":
-        x = ord(letter) - ord("A")
-    else:
-        x = ord(letter) - ord("A") - 1
+# A-T (跳过 I)；围棋坐标从下往上，y=0 对应第 19 路
+_GTP_LETTERS = "ABCDEFGHJKLMNOPQRST"
+_XY_TO_GTP = tuple(
+    tuple(f"{_GTP_LETTERS[x]}{19 - y}" for x in range(19)) for y in range(19)
+)
+_GTP_TO_XY = {_XY_TO_GTP[y][x]: (x, y) for y in range(19) for x in range(19)}
 
-    # 围棋坐标从下往上，需要转换
-    y = 19 - number
 
-    if 0 <= x < 19 and 0 <= y < 19:
-        return (x, y)
-    return None
+def gtp_to_coord(gtp_coord):
+    """将 GTP 坐标（如 'Q16'）转换为 (x, y) 坐标（0-18），非法坐标返回 None"""
+    if not gtp_coord:
+        return None
+    return _GTP_TO_XY.get(gtp_coord.upper())
 
 
 def coord_to_gtp(x, y):
     """将 (x, y) 坐标转换为 GTP 坐标"""
-    if x < 8:
-        letter = chr(ord("A") + x)
-    else:
-        letter = chr(ord("A") + x + 1)  # 跳过 I
-
-    number = 19 - y
-    return f"{letter}{number}"
+    return _XY_TO_GTP[y][x]
+
+
+# 棋盘格子状态（uint8 存储）
+EMPTY, BLACK, WHITE = 0, 1, 2
+_COLOR_TO_VALUE = {"B": BLACK, "W": WHITE}
+_VALUE_TO_COLOR = (None, "B", "W")
+
+
+@lru_cache(maxsize=None)
+def _neighbor_table(size):
+    """每个格子（索引 y*size+x）在棋盘内的相邻格子索引"""
+    table = []
+    for y in range(size):
+        for x in range(size):
+            idx = y * size + x
+            neighbors = []
+            if x > 0:
+                neighbors.append(idx - 1)
+            if x < size - 1:
+                neighbors.append(idx + 1)
+            if y > 0:
+                neighbors.append(idx - size)
+            if y < size - 1:
+                neighbors.append(idx + size)
+            table.append(tuple(neighbors))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def _zobrist_table(size):
+    """Zobrist 随机数表，索引为 (y*size+x)*2 + 颜色-1
+
+    固定种子保证不同进程间哈希一致；存成 Python int，避免逐个取 numpy 标量。
+    """
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 2**63, size=size * size * 2, dtype=np.uint64)
+    return tuple(keys.tolist())
 
 
 class DrawGoBoard:
-    """围棋棋盘类"""
+    """围棋棋盘类
+
+    除了棋盘本身，还增量维护棋串（group）：每个棋子所属的棋串编号、
+    每个棋串的棋子和气。落子时只更新相邻棋串，不需要做洪水填充。
+    棋串编号取该棋串中某一颗棋子的格子索引（y*size+x），因此不会重复。
+    """
 
     def __init__(self, size=19):
         self.size = size
-        self.board = [[None for _ in range(size)] for _ in range(size)]
+        # 0=空，1=黑，2=白
+        self.board = np.zeros((size, size), dtype=np.uint8)
         self.move_history = []  # 记录所有走子历史
+        # 每个棋子所属的棋串编号，空位为 -1
+        self.group_id = np.full((size, size), -1, dtype=np.int16)
+        self.group_libs = {}  # 棋串编号 -> 气的格子索引集合
+        self.group_stones = {}  # 棋串编号 -> 棋子的格子索引列表
+        # 一维视图（索引 y*size+x），与 board / group_id 共享内存
+        self._cells = self.board.reshape(-1)
+        self._group_ids = self.group_id.reshape(-1)
+        self._neighbors = _neighbor_table(size)
+        # Zobrist 哈希：落子/提子时增量 XOR 更新，用于快速判断局面是否相同
+        self._zobrist = _zobrist_table(size)
+        self.hash = 0
 
     def place_stone(self, x, y, color):
         """放置棋子，并处理提子"""
         if not (0 <= x < self.size and 0 <= y < self.size):
             return False
 
+        idx = y * self.size + x
+        cells = self._cells
+        group_id = self._group_ids
+
         # 检查位置是否已有棋子
-        if self.board[y][x] is not None:
+        if cells[idx] != EMPTY:
             return False
 
-        # 放置棋子
-        self.board[y][x] = color
-        self.move_history.append((x, y, color))
+        value = _COLOR_TO_VALUE[color]
+        opponent = WHITE if value == BLACK else BLACK
+        group_libs = self.group_libs
+        group_stones = self.group_stones
 
-        # 检查并移除没有气的对手棋子
-        opponent_color = "W" if color == "B" else "B"
-        self._remove_captured_stones(x, y, opponent_color)
+        # 一次取出相邻格子的状态和棋串编号（转成 Python int，后续不再逐个取 numpy 标量）
+        neighbors = self._neighbors[idx]
+        adjacent = list(
+            zip(neighbors, cells.take(neighbors).tolist(), group_id.take(neighbors).tolist())
+        )
+
+        self.move_history.append((x, y, color))
 
-        # 检查自己刚下的棋子是否也没有气（自杀），如果是则移除
-        if not self._has_liberty(x, y, color):
-            self.board[y][x] = None
+        # 检查自己刚下的棋子是否没有气（自杀）：
+        # 没有相邻空位、相邻同色棋串的气只剩这一点、也提不掉任何对手棋串
+        if not any(
+            stone == EMPTY
+            or (stone == value and len(group_libs[gid]) > 1)
+            or (stone == opponent and len(group_libs[gid]) == 1)
+            for _, stone, gid in adjacent
+        ):
             return False
 
+        # 放置棋子
+        cells[idx] = value
+        self.hash ^= self._zobrist[idx * 2 + value - 1]
+
+        # 与相邻同色棋串合并（已合并的棋串已从字典中移除）
+        libs = set()
+        stones = [idx]
+        for n, stone, gid in adjacent:
+            if stone == EMPTY:
+                libs.add(n)
+            elif stone == value and gid in group_stones:
+                other_stones = group_stones.pop(gid)
+                libs |= group_libs.pop(gid)
+                stones.extend(other_stones)
+                group_id[other_stones] = idx
+        libs.discard(idx)
+        group_id[idx] = idx
+        group_stones[idx] = stones
+        group_libs[idx] = libs
+
+        # 相邻对手棋串失去这口气，没有气的整串移除
+        for n, stone, gid in adjacent:
+            if stone == opponent and gid in group_libs:
+                other_libs = group_libs[gid]
+                other_libs.discard(idx)
+                if not other_libs:
+                    self._remove_group(gid, opponent)
+
         return True
 
     def get_stone(self, x, y):
-        """获取棋子颜色"""
+        """获取棋子颜色（'B'/'W'/None）"""
         if 0 <= x < self.size and 0 <= y < self.size:
-            return self.board[y][x]
+            return _VALUE_TO_COLOR[self.board[y, x]]
         return None
 
-    def _get_neighbors(self, x, y):
-        """获取相邻位置"""
-        neighbors = []
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.size and 0 <= ny < self.size:
-                neighbors.append((nx, ny))
-        return neighbors
-
-    def _has_liberty(self, x, y, color):
-        """检查一个棋子或一组棋子是否有气"""
-        visited = set()
-        to_check = [(x, y)]
-
-        while to_check:
-            cx, cy = to_check.pop()
-            if (cx, cy) in visited:
-                continue
-            visited.add((cx, cy))
-
-            # 检查相邻位置
-            for nx, ny in self._get_neighbors(cx, cy):
-                neighbor = self.board[ny][nx]
-                if neighbor is None:
-                    # 找到空位，有气
-                    return True
-                elif neighbor == color and (nx, ny) not in visited:
-                    # 同色棋子，继续检查
-                    to_check.append((nx, ny))
-
-        # 没有找到空位，没有气
-        return False
-
-    def _get_group(self, x, y, color):
-        """获取与指定位置相连的同色棋子组"""
-        group = set()
-        to_check = [(x, y)]
-        visited = set()
-
-        while to_check:
-            cx, cy = to_check.pop()
-            if (cx, cy) in visited:
-                continue
-            visited.add((cx, cy))
-
-            if self.board[cy][cx] == color:
-                group.add((cx, cy))
-                # 检查相邻位置
-                for nx, ny in self._get_neighbors(cx, cy):
-                    if (nx, ny) not in visited:
-                        to_check.append((nx, ny))
-
-        return group
-
-    def _remove_captured_stones(self, x, y, opponent_color):
-        """移除被吃掉的对手棋子"""
-        # 检查相邻的对手棋子组
-        for nx, ny in self._get_neighbors(x, y):
-            if self.board[ny][nx] == opponent_color:
-                # 检查这个对手棋子组是否有气
-                if not self._has_liberty(nx, ny, opponent_color):
-                    # 没有气，移除整个组
-                    group = self._get_group(nx, ny, opponent_color)
-                    for gx, gy in group:
-                        self.board[gy][gx] = None
+    def _remove_group(self, gid, color):
+        """移除整个棋串，并把空出的格子加回相邻棋串的气"""
+        stones = self.group_stones.pop(gid)
+        del self.group_libs[gid]
+        cells = self._cells
+        group_id = self._group_ids
+
+        cells[stones] = EMPTY
+        group_id[stones] = -1
+        for stone in stones:
+            self.hash ^= self._zobrist[stone * 2 + color - 1]
+
+        for stone in stones:
+            neighbors = self._neighbors[stone]
+            for neighbor_gid in group_id.take(neighbors).tolist():
+                if neighbor_gid >= 0:
+                    self.group_libs[neighbor_gid].add(stone)
 
     def copy(self):
         """复制棋盘"""
         new_board = DrawGoBoard(self.size)
-        new_board.board = [row[:] for row in self.board]
+        new_board.board[...] = self.board
         new_board.move_history = self.move_history[:]
+        new_board.group_id[...] = self.group_id
+        new_board.group_libs = {gid: set(libs) for gid, libs in self.group_libs.items()}
+        new_board.group_stones = {
+            gid: stones[:] for gid, stones in self.group_stones.items()
+        }
+        new_board.hash = self.hash
         return new_board
 
 
-def build_board_from_moves(moves_data, up_to_move):
-    """根据 moves 数据构建到指定手数为止的棋盘状态"""
-    board = DrawGoBoard(19)
+# 解析后的走子记录：手数、坐标和颜色（BLACK / WHITE）
+MOVE_DTYPE = np.dtype([("move", "i4"), ("x", "i1"), ("y", "i1"), ("color", "u1")])
+
+
+def parse_moves(moves_data):
+    """将 moves 数据一次性解析为按手数排序的结构化数组
 
-    # 只处理到 up_to_move 之前的走子
+    pass 和无法解析的坐标会被跳过；同一手数保持原有顺序。
+    """
+    records = []
     for move_data in moves_data:
-        if move_data["move"] < up_to_move:
-            played = move_data.get("played")
-            if played:
-                coord = gtp_to_coord(played)
-                if coord:
-                    x, y = coord
-                    color = move_data.get("color", "B")
-                    board.place_stone(x, y, color)
+        coord = gtp_to_coord(move_data.get("played"))
+        if coord:
+            color = _COLOR_TO_VALUE[move_data.get("color", "B")]
+            records.append((move_data["move"], *coord, color))
+    parsed = np.array(records, dtype=MOVE_DTYPE)
+    return parsed[np.argsort(parsed["move"], kind="stable")]
+
+
+def play_parsed_moves(board, parsed):
+    """在棋盘上依序落下 parse_moves 产生的走子记录"""
+    for x, y, color in zip(
+        parsed["x"].tolist(), parsed["y"].tolist(), parsed["color"].tolist()
+    ):
+        board.place_stone(x, y, _VALUE_TO_COLOR[color])
 
+
+def build_board_from_parsed(parsed, up_to_move):
+    """根据 parse_moves 的结果构建到指定手数为止的棋盘状态"""
+    board = DrawGoBoard(19)
+    # 记录已按手数排序，直接截取 up_to_move 之前的部分
+    end = np.searchsorted(parsed["move"], up_to_move)
+    play_parsed_moves(board, parsed[:end])
     return board
 
 
+def build_board_from_moves(moves_data, up_to_move):
+    """根据 moves 数据构建到指定手数为止的棋盘状态"""
+    return build_board_from_parsed(parse_moves(moves_data), up_to_move)
+
+
+# draw_board 结果缓存：{(局面哈希, 标注参数): Image}，按 LRU 淘汰
+_BOARD_IMAGE_CACHE_SIZE = 16
+_board_image_cache = OrderedDict()
+_board_image_cache_lock = threading.Lock()  # GIF 在多个线程中并行生成
+
+
 def draw_board(
     board,
     highlight_move=None,
@@ -180,117 +254,263 @@ def draw_board(
     ai_best=None,
     pv_moves=None,
     move_number=None,
-    pv_move_numbers=None,  # 新增：PV 步骤的顺序号字典 {坐标: 序号}
+    pv_move_numbers=None,  # 新增：PV 步骤的顺序号字典 {(x, y): 序号}
 ):
-    """绘制棋盘图像"""
-    # 图像尺寸（增加边距以容纳坐标标注）
-    img_size = 800
-    margin = 50  # 增加边距以容纳坐标标注
-    board_size = img_size - 2 * margin
-    cell_size = board_size / (board.size - 1)
+    """绘制棋盘图像
+
+    相同局面（Zobrist 哈希）和相同标注的结果会被缓存并直接复用，
+    返回的 Image 可能被共享，调用方不应修改它。
+    """
+    key = (
+        board.size,
+        board.hash,
+        highlight_move,
+        highlight_color,
+        ai_best,
+        tuple(pv_moves) if pv_moves else None,
+        move_number,
+        frozenset(pv_move_numbers.items()) if pv_move_numbers else None,
+    )
+    with _board_image_cache_lock:
+        img = _board_image_cache.get(key)
+        if img is not None:
+            _board_image_cache.move_to_end(key)
+            return img
+
+    img = _render_board(
+        board,
+        highlight_move=highlight_move,
+        ai_best=ai_best,
+        pv_moves=pv_moves,
+        move_number=move_number,
+        pv_move_numbers=pv_move_numbers,
+    )
+    with _board_image_cache_lock:
+        _board_image_cache[key] = img
+        if len(_board_image_cache) > _BOARD_IMAGE_CACHE_SIZE:
+            _board_image_cache.popitem(last=False)
+    return img
+
 
-    # 创建图像
+def _load_font(size):
+    """按 Helvetica → arial → 默认字体的顺序加载字体"""
+    try:
+        return ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", size)
+    except:
+        try:
+            return ImageFont.truetype("arial.ttf", size)
+        except:
+            return ImageFont.load_default()
+
+
+# 棋盘绘制用字体，导入时加载一次
+_PV_FONT = _load_font(16)  # PV 顺序号
+_HDR_FONT = _load_font(20)  # 右上角手数说明
+_COORD_FONT = _load_font(14)  # 坐标标注
+
+# 棋盘图像几何参数（整个流程只画 800px 的棋盘）
+_IMG_SIZE = 800
+_MARGIN = 50  # 增加边距以容纳坐标标注
+_STAR_POINTS = (
+    (3, 3),
+    (3, 9),
+    (3, 15),
+    (9, 3),
+    (9, 9),
+    (9, 15),
+    (15, 3),
+    (15, 9),
+    (15, 15),
+)
+
+
+@lru_cache(maxsize=4)
+def _board_geometry(size, img_size):
+    """返回 (stone_radius, line_pos)
+
+    line_pos[i] 为第 i 条线的像素坐标，x / y 方向相同。
+    """
+    cell_size = (img_size - 2 * _MARGIN) / (size - 1)
+    stone_radius = int(cell_size * 0.48)
+    line_pos = tuple(_MARGIN + i * cell_size for i in range(size))
+    return stone_radius, line_pos
+
+
+# 19 路棋盘的几何参数导入时算好，绘制时直接查表
+_STONE_RADIUS, _LINE_POS = _board_geometry(19, _IMG_SIZE)
+
+
+@lru_cache(maxsize=800)
+def _num_glyph(n, white):
+    """预先栅格化一个顺序号，返回 (glyph, dx, dy)
+
+    glyph 是裁剪到字形范围的 RGBA 小图，alpha 为字形覆盖率；
+    (dx, dy) 是其左上角相对于交叉点中心的偏移，与原先
+    textbbox + text 的居中方式一致。
+    """
+    text = str(n)
+    left, top, right, bottom = _PV_FONT.getbbox(text)
+    width, height = right - left, bottom - top
+    mask = Image.new("L", (width, height), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=_PV_FONT)
+    glyph = Image.new("RGBA", (width, height), "white" if white else "black")
+    glyph.putalpha(mask)
+    return glyph, left - width // 2, top - height // 2
+
+
+@lru_cache(maxsize=4)
+def _board_template(size, img_size):
+    """预先栅格化一次棋盘的静态图层
+
+    返回 (template, black_layer, white_layer, cell_map, label_mask)：
+    - template：背景 + 网格线 + 星位，(H, W, 3) uint8
+    - black_layer / white_layer：在 template 上画满黑子 / 白子
+    - cell_map：每个像素被哪个格子（y*size+x）的棋子覆盖，未覆盖为 -1
+    - label_mask：坐标标注的 "L" 遮罩，最后统一贴上
+    棋子之间互不重叠，因此按 cell_map 逐像素选取图层即可得到与逐个绘制相同的结果。
+    """
+    margin = _MARGIN
+    stone_radius, line_pos = _board_geometry(size, img_size)
+
+    # 背景、网格线和星位
     img = Image.new("RGB", (img_size, img_size), color="#DCB35C")
     draw = ImageDraw.Draw(img)
-
-    # 绘制网格线
-    for i in range(board.size):
-        x = margin + i * cell_size
+    for i in range(size):
+        x = line_pos[i]
         y_start = margin
-        y_end = margin + (board.size - 1) * cell_size
+        y_end = line_pos[-1]
         draw.line([(x, y_start), (x, y_end)], fill="black", width=2)
 
-        y = margin + i * cell_size
+        y = line_pos[i]
         x_start = margin
-        x_end = margin + (board.size - 1) * cell_size
+        x_end = line_pos[-1]
         draw.line([(x_start, y), (x_end, y)], fill="black", width=2)
 
-    # 绘制星位
-    star_points = [
-        (3, 3),
-        (3, 9),
-        (3, 15),
-        (9, 3),
-        (9, 9),
-        (9, 15),
-        (15, 3),
-        (15, 9),
-        (15, 15),
-    ]
-    for x, y in star_points:
-        cx = margin + x * cell_size
-        cy = margin + y * cell_size
+    for x, y in _STAR_POINTS:
+        cx = line_pos[x]
+        cy = line_pos[y]
         draw.ellipse([cx - 5, cy - 5, cx + 5, cy + 5], fill="black")
 
-    # 绘制棋子
-    stone_radius = int(cell_size * 0.48)
-    for y in range(board.size):
-        for x in range(board.size):
-            stone = board.get_stone(x, y)
-            if stone:
-                cx = margin + x * cell_size
-                cy = margin + y * cell_size
-
-                # 绘制棋子
-                if stone == "B":
-                    draw.ellipse(
-                        [
-                            cx - stone_radius,
-                            cy - stone_radius,
-                            cx + stone_radius,
-                            cy + stone_radius,
-                        ],
-                        fill="black",
-                        outline="black",
-                        width=2,
-                    )
-                else:  # W
-                    draw.ellipse(
-                        [
-                            cx - stone_radius,
-                            cy - stone_radius,
-                            cx + stone_radius,
-                            cy + stone_radius,
-                        ],
-                        fill="white",
-                        outline="black",
-                        width=2,
-                    )
+    template = np.asarray(img).copy()
+
+    # 画满黑子 / 白子的图层，以及每个像素所属格子的索引图
+    black_img = img.copy()
+    white_img = img.copy()
+    black_draw = ImageDraw.Draw(black_img)
+    white_draw = ImageDraw.Draw(white_img)
+    id_img = Image.new("I", (img_size, img_size), color=0)
+    id_draw = ImageDraw.Draw(id_img)
+    for y in range(size):
+        for x in range(size):
+            cx = line_pos[x]
+            cy = line_pos[y]
+            bbox = [
+                cx - stone_radius,
+                cy - stone_radius,
+                cx + stone_radius,
+                cy + stone_radius,
+            ]
+            black_draw.ellipse(bbox, fill="black", outline="black", width=2)
+            white_draw.ellipse(bbox, fill="white", outline="black", width=2)
+            cell_id = y * size + x + 1
+            id_draw.ellipse(bbox, fill=cell_id, outline=cell_id, width=2)
+    cell_map = np.asarray(id_img).astype(np.int32) - 1
+
+    # 坐标标注遮罩（左侧 1~19，底部 A~T）
+    label_mask = Image.new("L", (img_size, img_size), color=0)
+    label_draw = ImageDraw.Draw(label_mask)
+    coord_font = _COORD_FONT
 
-                # 如果这个位置在 PV 序列中，绘制顺序号
-                if pv_move_numbers:
-                    coord_str = coord_to_gtp(x, y)
-                    if coord_str in pv_move_numbers:
-                        step_num = pv_move_numbers[coord_str]
-                        # 根据棋子颜色选择文字颜色
-                        text_color = "white" if stone == "B" else "black"
-                        # 绘制数字
-                        try:
-                            font = ImageFont.truetype(
-                                "/System/Library/Fonts/Helvetica.ttc", 16
-                            )
-                        except:
-                            try:
-                                font = ImageFont.truetype("arial.ttf", 16)
-                            except:
-                                font = ImageFont.load_default()
-
-                        # 获取文字尺寸并居中绘制
-                        text = str(step_num)
-                        bbox = draw.textbbox((0, 0), text, font=font)
-                        text_width = bbox[2] - bbox[0]
-                        text_height = bbox[3] - bbox[1]
-                        text_x = cx - text_width // 2
-                        text_y = cy - text_height // 2
-                        draw.text((text_x, text_y), text, fill=text_color, font=font)
+    # 左侧标注：1~19（从上到下）
+    for i in range(size):
+        y = line_pos[i]
+        number = 19 - i  # 从 19 到 1
+        text = str(number)
+        bbox = label_draw.textbbox((0, 0), text, font=coord_font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        # 左侧，垂直居中
+        label_draw.text(
+            (margin - text_width - 8, y - text_height // 2),
+            text,
+            fill=255,
+            font=coord_font,
+        )
+
+    # 底部标注：A~T（从左到右，跳过 I）
+    for i in range(size):
+        x = line_pos[i]
+        letter = _GTP_LETTERS[i]
+        bbox = label_draw.textbbox((0, 0), letter, font=coord_font)
+        text_width = bbox[2] - bbox[0]
+        # 底部，水平居中
+        y_bottom = line_pos[-1]
+        label_draw.text(
+            (x - text_width // 2, y_bottom + 8), letter, fill=255, font=coord_font
+        )
+
+    for layer in (template, cell_map):
+        layer.flags.writeable = False
+    return (
+        template,
+        np.asarray(black_img),
+        np.asarray(white_img),
+        cell_map,
+        label_mask,
+    )
+
+
+def _render_board(
+    board,
+    highlight_move=None,
+    ai_best=None,
+    pv_moves=None,
+    move_number=None,
+    pv_move_numbers=None,
+):
+    """实际绘制棋盘图像"""
+    # 图像尺寸（增加边距以容纳坐标标注）
+    img_size = _IMG_SIZE
+    # 19 路直接使用预先算好的几何参数，其他尺寸走通用计算
+    if board.size == 19:
+        stone_radius, line_pos = _STONE_RADIUS, _LINE_POS
+    else:
+        stone_radius, line_pos = _board_geometry(board.size, img_size)
+
+    # 合成棋子：按每个像素所属格子的状态，从模板 / 黑子图层 / 白子图层中选取
+    template, black_layer, white_layer, cell_map, label_mask = _board_template(
+        board.size, img_size
+    )
+    cells = np.append(board.board.reshape(-1), EMPTY)  # cell_map 的 -1 映射到 EMPTY
+    stones = cells[cell_map][..., None]
+    canvas = np.where(
+        stones == BLACK,
+        black_layer,
+        np.where(stones == WHITE, white_layer, template),
+    )
+
+    img = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(img)
+
+    # 如果棋子在 PV 序列中，绘制顺序号（只遍历有序号的格子）
+    if pv_move_numbers:
+        for (x, y), step_num in pv_move_numbers.items():
+            stone = board.get_stone(x, y)
+            if not stone:
+                continue
+            cx = line_pos[x]
+            cy = line_pos[y]
+            # 黑子上用白字、白子上用黑字，贴上缓存的字形
+            glyph, dx, dy = _num_glyph(step_num, stone == "B")
+            img.paste(glyph, (round(cx + dx), round(cy + dy)), glyph)
 
     # 高亮实际走的走子
     if highlight_move:
         coord = gtp_to_coord(highlight_move)
         if coord:
             x, y = coord
-            cx = margin + x * cell_size
-            cy = margin + y * cell_size
+            cx = line_pos[x]
+            cy = line_pos[y]
             # 绘制红色圆圈
             draw.ellipse(
                 [
@@ -308,8 +528,8 @@ def draw_board(
         coord = gtp_to_coord(ai_best)
         if coord:
             x, y = coord
-            cx = margin + x * cell_size
-            cy = margin + y * cell_size
+            cx = line_pos[x]
+            cy = line_pos[y]
             # 绘制绿色圆圈
             draw.ellipse(
                 [
@@ -350,8 +570,8 @@ def draw_board(
             coord = gtp_to_coord(pv_move)
             if coord:
                 x, y = coord
-                cx = margin + x * cell_size
-                cy = margin + y * cell_size
+                cx = line_pos[x]
+                cy = line_pos[y]
                 color = colors[idx % len(colors)]
                 # 绘制小点
                 dot_radius = 8
@@ -368,65 +588,57 @@ def draw_board(
                 )
 
     # 添加文字说明
-    try:
-        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 20)
-    except:
-        try:
-            font = ImageFont.truetype("arial.ttf", 20)
-        except:
-            font = ImageFont.load_default()
-
     if move_number:
         text = f"Move {move_number}"
-        bbox = draw.textbbox((0, 0), text, font=font)
+        bbox = draw.textbbox((0, 0), text, font=_HDR_FONT)
         text_width = bbox[2] - bbox[0]
-        draw.text((img_size - text_width - 10, 10), text, fill="black", font=font)
+        draw.text((img_size - text_width - 10, 10), text, fill="black", font=_HDR_FONT)
 
-    # 绘制坐标标注
-    # 使用较小的字体
-    try:
-        coord_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 14)
-    except:
-        try:
-            coord_font = ImageFont.truetype("arial.ttf", 14)
-        except:
-            coord_font = ImageFont.load_default()
+    # 绘制坐标标注（预先栅格化的遮罩，一次贴上）
+    img.paste("black", (0, 0), label_mask)
 
-    # 左侧标注：1~19（从上到下）
-    for i in range(board.size):
-        y = margin + i * cell_size
-        number = 19 - i  # 从 19 到 1
-        text = str(number)
-        bbox = draw.textbbox((0, 0), text, font=coord_font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        # 左侧，垂直居中
-        draw.text(
-            (margin - text_width - 8, y - text_height // 2),
-            text,
-            fill="black",
-            font=coord_font,
-        )
+    return img
 
-    # 底部标注：A~T（从左到右，跳过 I）
-    letters = []
-    for i in range(19):
-        if i < 8:
-            letter = chr(ord("A") + i)  # A-H
-        else:
-            letter = chr(ord("A") + i + 1)  # J-T (跳过 I)
-        letters.append(letter)
-
-    for i in range(board.size):
-        x = margin + i * cell_size
-        letter = letters[i]
-        bbox = draw.textbbox((0, 0), letter, font=coord_font)
-        text_width = bbox[2] - bbox[0]
-        # 底部，水平居中
-        y_bottom = margin + (board.size - 1) * cell_size
-        draw.text(
-            (x - text_width // 2, y_bottom + 8), letter, fill="black", font=coord_font
-        )
+
+def _draw_pv_step(img, board, x, y, step_num):
+    """在上一张 PV 帧上补画新落下的一手及其顺序号，返回新图像
+
+    仅适用于这一手没有提子的情况（调用方负责判断），结果与 draw_board
+    完整重绘逐像素相同。传入的 img 可能来自缓存，不会被修改。
+    """
+    img_size = _IMG_SIZE
+    if board.size == 19:
+        stone_radius, line_pos = _STONE_RADIUS, _LINE_POS
+    else:
+        stone_radius, line_pos = _board_geometry(board.size, img_size)
+
+    template, black_layer, white_layer, cell_map, label_mask = _board_template(
+        board.size, img_size
+    )
+    stone = board.get_stone(x, y)
+    layer = black_layer if stone == "B" else white_layer
+
+    # 只处理这颗棋子所在的小方块
+    cx = line_pos[x]
+    cy = line_pos[y]
+    x0 = max(int(cx) - stone_radius - 2, 0)
+    y0 = max(int(cy) - stone_radius - 2, 0)
+    x1 = min(int(cx) + stone_radius + 3, img_size)
+    y1 = min(int(cy) + stone_radius + 3, img_size)
+    covered = cell_map[y0:y1, x0:x1] == y * board.size + x
+
+    img = img.copy()
+    patch = np.where(
+        covered[..., None], layer[y0:y1, x0:x1], np.asarray(img.crop((x0, y0, x1, y1)))
+    )
+    img.paste(Image.fromarray(patch), (x0, y0))
+
+    # 与完整重绘相同的顺序：先顺序号，再在重画过的像素上补回坐标标注
+    glyph, dx, dy = _num_glyph(step_num, stone == "B")
+    img.paste(glyph, (round(cx + dx), round(cy + dy)), glyph)
+    labels = np.where(covered, np.asarray(label_mask.crop((x0, y0, x1, y1))), 0)
+    if labels.any():
+        img.paste("black", (x0, y0), Image.fromarray(labels.astype(np.uint8)))
 
     return img
 
@@ -445,13 +657,15 @@ def draw_global_board(all_moves_data, output_path):
                 color = move_data.get("color", "B")
                 board.place_stone(x, y, color)
 
-    # 创建手数标注字典 {坐标: 手数}
+    # 创建手数标注字典 {(x, y): 手数}
     move_numbers = {}
     for move_data in all_moves_data:
         played = move_data.get("played")
         move_number = move_data.get("move")
         if played and move_number:
-            move_numbers[played] = move_number
+            coord = gtp_to_coord(played)
+            if coord:
+                move_numbers[coord] = move_number
 
     # 绘制棋盘
     img = draw_board(
@@ -607,44 +821,36 @@ def draw_winrate_chart(all_moves_data, output_path):
             y = margin_top + chart_height * (1 - y_percent)
             points.append((x, y))
         
-        # 使用 Catmull-Rom 插值生成平滑曲线
-        def catmull_rom_spline(p0, p1, p2, p3, t):
-            """Catmull-Rom 样条插值"""
-            t2 = t * t
-            t3 = t2 * t
-            
-            x = 0.5 * (2 * p1[0] + (-p0[0] + p2[0]) * t + 
-                       (2 * p0[0] - 5 * p1[0] + 4 * p2[0] - p3[0]) * t2 + 
-                       (-p0[0] + 3 * p1[0] - 3 * p2[0] + p3[0]) * t3)
-            y = 0.5 * (2 * p1[1] + (-p0[1] + p2[1]) * t + 
-                       (2 * p0[1] - 5 * p1[1] + 4 * p2[1] - p3[1]) * t2 + 
-                       (-p0[1] + 3 * p1[1] - 3 * p2[1] + p3[1]) * t3)
-            return (x, y)
-        
-        # 生成平滑曲线点
-        smooth_points = []
+        # 使用 Catmull-Rom 插值生成平滑曲线（所有段与插值点一次向量化计算）
         num_segments = 20  # 每段之间的插值点数
-        
-        for i in range(len(points) - 1):
-            # 获取控制点
-            p0 = points[max(0, i - 1)]
-            p1 = points[i]
-            p2 = points[i + 1]
-            p3 = points[min(len(points) - 1, i + 2)]
-            
-            # 生成插值点
-            for j in range(num_segments):
-                t = j / num_segments
-                smooth_points.append(catmull_rom_spline(p0, p1, p2, p3, t))
-        
+        pts = np.array(points, dtype=np.float64)
+        seg = np.arange(len(pts) - 1)
+        # 获取控制点，形状 (段数, 1, 2)
+        p0 = pts[np.maximum(seg - 1, 0)][:, None, :]
+        p1 = pts[seg][:, None, :]
+        p2 = pts[seg + 1][:, None, :]
+        p3 = pts[np.minimum(seg + 2, len(pts) - 1)][:, None, :]
+        # 插值参数，形状 (1, 插值点数, 1)
+        t = (np.arange(num_segments) / num_segments)[None, :, None]
+        t2 = t * t
+        t3 = t2 * t
+        smooth = 0.5 * (
+            2 * p1
+            + (-p0 + p2) * t
+            + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2
+            + (-p0 + 3 * p1 - 3 * p2 + p3) * t3
+        )
+        smooth_points = list(map(tuple, smooth.reshape(-1, 2).tolist()))
+
         # 添加最后一个点
         if smooth_points:
             smooth_points.append(points[-1])
         
         # 绘制平滑曲线（更粗的線條，在棋盘色背景上更明显）
+        # 整条折线一次交给 PIL 绘制（插值点很密，不需要 joint="curve"，
+        # 后者会在每个转折点额外画一次扇形，反而更慢）
         if len(smooth_points) > 1:
-            for i in range(len(smooth_points) - 1):
-                draw.line([smooth_points[i], smooth_points[i + 1]], fill=line_color, width=5)
+            draw.line(smooth_points, fill=line_color, width=5)
     else:
         # 只有一个数据点，只绘制線條（不繪製點）
         pass
@@ -666,28 +872,119 @@ def draw_winrate_chart(all_moves_data, output_path):
     print(f"Winrate chart saved: {filename}")
 
 
-def create_gif_for_move(move_data, all_moves_data, output_path):
-    """为单个 move 创建 GIF 动画"""
+class _GifPalette:
+    """GIF 共享调色板：以首帧的常见颜色加一组灰阶建立
+
+    后续帧只会多出 PV 序号等文字，其抗锯齿边缘落在灰阶上。
+    帧内每种颜色只查一次调色板，再用 24 位查找表一次映射全部像素。
+    """
+
+    def __init__(self, frame, max_colors=256, gray_levels=32):
+        grays = [(int(v),) * 3 for v in np.linspace(0, 255, gray_levels)]
+        colors = dict.fromkeys(grays)
+        frame_colors = sorted(frame.getcolors(frame.width * frame.height), reverse=True)
+        for _, color in frame_colors:
+            if len(colors) >= max_colors:
+                break
+            colors.setdefault(color)
+        self.colors = np.array(list(colors), dtype=np.int32)
+        self.palette = self.colors.astype(np.uint8).reshape(-1).tolist()
+        # 颜色 -> 调色板索引，调色板外的颜色在首次遇到时补上最接近的索引
+        self._index = {color: i for i, color in enumerate(colors)}
+        self._lut = np.zeros(1 << 24, dtype=np.uint8)
+
+    def _lookup(self, color):
+        index = self._index.get(color)
+        if index is None:
+            diff = self.colors - np.array(color, dtype=np.int32)
+            index = int((diff * diff).sum(axis=1).argmin())
+            self._index[color] = index
+        return index
+
+    def convert(self, frame, pixels):
+        """将 RGB 帧映射到共享调色板，返回 P 模式图像
+
+        pixels 为该帧的 (H, W, 3) uint8 数组，与 MP4 编码共用。
+        """
+        lut = self._lut
+        for _, (r, g, b) in frame.getcolors(frame.width * frame.height):
+            lut[r | (g << 8) | (b << 16)] = self._lookup((r, g, b))
+        keys = pixels[..., 0].astype(np.uint32)
+        keys |= pixels[..., 1].astype(np.uint32) << 8
+        keys |= pixels[..., 2].astype(np.uint32) << 16
+        img = Image.fromarray(lut[keys], mode="P")
+        img.putpalette(self.palette)
+        return img
+
+
+class _Mp4Stream:
+    """逐帧写入 MP4（用於 LINE video 訊息）
+
+    fps=1 表示每秒 1 幀（與 GIF 的 1000ms duration 對應）。
+    MP4 生成失敗只打印警告，GIF 仍然可用。
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.mp4_path = output_path.replace(".gif", ".mp4")
+        try:
+            self._writer = imageio.get_writer(
+                self.mp4_path,
+                fps=1,
+                codec="libx264",
+                pixelformat="yuv420p",
+                output_params=["-movflags", "+faststart"],  # 優化串流播放
+            )
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error):
+        print(f"Warning: Failed to create MP4 for {self.output_path}: {error}")
+        self._writer = None
+
+    def append(self, pixels, repeat=1):
+        if self._writer is None:
+            return
+        try:
+            for _ in range(repeat):
+                self._writer.append_data(pixels)
+        except Exception as e:
+            writer = self._writer
+            self._fail(e)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def close(self):
+        if self._writer is None:
+            return
+        try:
+            self._writer.close()
+            print(f"MP4 created: {os.path.basename(self.mp4_path)}")
+        except Exception as e:
+            self._fail(e)
+
+
+def generate_frames(move_data, board):
+    """依序产生单个 move 的动画帧（PIL Image）
+
+    board 为当前手之前的棋盘，不会被修改。
+    """
     move_number = move_data["move"]
     played = move_data.get("played")
     ai_best = move_data.get("ai_best")
     pv = move_data.get("pv", [])
     color = move_data.get("color", "B")
 
-    # 构建到当前手数之前的棋盘（不包含当前手）
-    board = build_board_from_moves(all_moves_data, move_number)
-
-    frames = []
-
     # 第一帧：当前棋盘状态（走子之前）+ 高亮实际走的走子和 AI 推荐
-    img = draw_board(
+    yield draw_board(
         board,
         highlight_move=played,
         ai_best=ai_best,
         pv_moves=[],
         move_number=move_number,
     )
-    frames.append(img.copy())
 
     # 第二帧：显示实际走的走子后的棋盘
     board_with_played = board.copy()
@@ -697,14 +994,13 @@ def create_gif_for_move(move_data, all_moves_data, output_path):
             x, y = coord
             board_with_played.place_stone(x, y, color)
 
-    img = draw_board(
+    yield draw_board(
         board_with_played,
         highlight_move=played,
         ai_best=ai_best,
         pv_moves=[],
         move_number=f"{move_number} (played)",
     )
-    frames.append(img.copy())
 
     # 后续帧：显示 AI 推荐的 PV 序列
     # PV 的第一步就是 ai_best，所以不需要单独画 ai_best
@@ -713,70 +1009,81 @@ def create_gif_for_move(move_data, all_moves_data, output_path):
 
         # PV 序列从当前玩家开始（第一步是 ai_best）
         pv_color = color
-        # 用于记录 PV 步骤的顺序号 {坐标: 序号}
+        # 用于记录 PV 步骤的顺序号 {(x, y): 序号}
         pv_move_numbers = {}
 
+        # 上一张 PV 帧；无提子时只在它上面补画新的一手
+        pv_frame = None
+
         for i, pv_move in enumerate(pv[:10]):  # 最多显示 10 手 PV
             coord = gtp_to_coord(pv_move)
             if coord:
                 x, y = coord
                 # 放置棋子
+                stones_before = np.count_nonzero(current_board.board)
                 current_board.place_stone(x, y, pv_color)
+                stones_after = np.count_nonzero(current_board.board)
 
                 # 记录这一步的顺序号（从 1 开始）
-                pv_move_numbers[pv_move] = i + 1
-
-                # PV 序列帧不显示右上角文字
-                img = draw_board(
-                    current_board,
-                    highlight_move=None,
-                    ai_best=None,  # 不显示绿色框线，因为已经有数字标注了
-                    pv_moves=[],
-                    move_number=None,  # PV 序列帧不显示文字
-                    pv_move_numbers=pv_move_numbers,  # 传递 PV 顺序号
-                )
-                frames.append(img.copy())
+                pv_move_numbers[(x, y)] = i + 1
+
+                if pv_frame is not None and stones_after == stones_before + 1:
+                    pv_frame = _draw_pv_step(pv_frame, current_board, x, y, i + 1)
+                else:
+                    # 第一张 PV 帧、有提子或落子无效时完整重绘
+                    # PV 序列帧不显示右上角文字
+                    pv_frame = draw_board(
+                        current_board,
+                        highlight_move=None,
+                        ai_best=None,  # 不显示绿色框线，因为已经有数字标注了
+                        pv_moves=[],
+                        move_number=None,  # PV 序列帧不显示文字
+                        pv_move_numbers=pv_move_numbers,  # 传递 PV 顺序号
+                    )
+                yield pv_frame
 
                 # 下一步是对手的颜色
                 pv_color = "W" if pv_color == "B" else "B"
 
+
+def create_gif_for_move(move_data, all_moves_data, output_path, board=None):
+    """为单个 move 创建 GIF 动画（同时生成 MP4）
+
+    board 为当前手之前的棋盘；未提供时从 all_moves_data 重新构建。
+    """
+    # 构建到当前手数之前的棋盘（不包含当前手）
+    if board is None:
+        board = build_board_from_moves(all_moves_data, move_data["move"])
+
+    # 帧一产生就编码：MP4 直接写入 ffmpeg，GIF 只保留共享调色板的 P 模式帧，
+    # 不再把整组 RGB 帧留在内存中
+    mp4 = _Mp4Stream(output_path)
+    palette = None
+    gif_frames = []
+    for frame in generate_frames(move_data, board):
+        # 每帧只转换一次 numpy 数组，GIF 与 MP4 共用
+        pixels = np.asarray(frame)
+        if palette is None:
+            # 所有帧共用同一个调色板，避免 PIL 逐帧做中位切分量化
+            palette = _GifPalette(frame)
+        gif_frames.append(palette.convert(frame, pixels))
+        mp4.append(pixels)
+    # 最后一帧停留 5 秒：MP4 再重复 4 次
+    mp4.append(pixels, repeat=4)
+    mp4.close()
+
     # 保存为 GIF（使用 PIL 直接保存，更可靠地控制帧延迟）
     # duration 设置为 1 秒（1000 毫秒），最后一帧停留 5 秒（5000 毫秒）
-    if frames:
-        # 将 duration 转换为毫秒（PIL 使用毫秒）
-        # 1 秒 = 1000 毫秒，最后一帧 5 秒 = 5000 毫秒
-        durations = [1000] * (len(frames) - 1) + [5000]  # 最后一帧停留 5 秒
-
-        # 使用 PIL 直接保存 GIF，更可靠地控制帧延迟
-        frames[0].save(
-            output_path,
-            save_all=True,
-            append_images=frames[1:],
-            duration=durations,
-            loop=0,
-            format="GIF",
-        )
-
-        # 同時生成 MP4 版本（用於 LINE video 訊息）
-        mp4_path = output_path.replace(".gif", ".mp4")
-        try:
-            # 使用 imageio 生成 MP4
-            # fps=1 表示每秒 1 幀（與 GIF 的 1000ms duration 對應）
-            # 最後一幀需要重複 5 次以停留 5 秒
-            mp4_frames = frames[:-1] + [frames[-1]] * 5
-
-            imageio.mimsave(
-                mp4_path,
-                [np.array(frame) for frame in mp4_frames],
-                fps=1,
-                codec="libx264",
-                pixelformat="yuv420p",
-                output_params=["-movflags", "+faststart"],  # 優化串流播放
-            )
-            print(f"MP4 created: {os.path.basename(mp4_path)}")
-        except Exception as e:
-            print(f"Warning: Failed to create MP4 for {output_path}: {e}")
-            # 即使 MP4 生成失敗，GIF 仍然可用
+    durations = [1000] * (len(gif_frames) - 1) + [5000]
+    gif_frames[0].save(
+        output_path,
+        save_all=True,
+        append_images=gif_frames[1:],
+        duration=durations,
+        loop=0,
+        format="GIF",
+        optimize=False,  # 调色板已固定，跳过 PIL 的逐帧调色板重排
+    )
 
 
 def filter_critical_moves(moves, threshold=2.0):
@@ -789,6 +1096,10 @@ def filter_critical_moves(moves, threshold=2.0):
     return [m for m in moves if get_score_loss(m) > threshold]
 
 
+# Number of GIFs rendered concurrently by draw_all_moves_gif
+GIF_WORKERS = min(4, (os.cpu_count() or 1) + 1)
+
+
 async def draw_all_moves_gif(json_file_path: str, output_dir: str) -> List[str]:
     """Call integrated functions to draw GIFs for all topScoreLossMoves"""
 
@@ -797,9 +1108,9 @@ async def draw_all_moves_gif(json_file_path: str, output_dir: str) -> List[str]:
     if not os.path.exists(json_file_path):
         raise FileNotFoundError(f"JSON file not found: {json_file_path}")
 
-    # Read JSON file
-    with open(json_file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    # Read JSON file off the event loop
+    text = await asyncio.to_thread(Path(json_file_path).read_text, encoding="utf-8")
+    data = json.loads(text)
 
     # Get all moves (for building board state)
     all_moves = data.get("moves", [])
@@ -810,24 +1121,49 @@ async def draw_all_moves_gif(json_file_path: str, output_dir: str) -> List[str]:
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
 
-    # First draw global board
+    # Draw global board and winrate chart in worker threads, overlapping
+    # with the GIF rendering below instead of blocking the event loop
     global_board_path = os.path.join(output_dir, "global_board.png")
-    draw_global_board(all_moves, global_board_path)
-    
-    # Draw winrate chart
     winrate_chart_path = os.path.join(output_dir, "winrate_chart.png")
-    draw_winrate_chart(all_moves, winrate_chart_path)
+    tasks = [
+        asyncio.to_thread(draw_global_board, all_moves, global_board_path),
+        asyncio.to_thread(draw_winrate_chart, all_moves, winrate_chart_path),
+    ]
 
     # Generate GIF for each top move
+    # Parse the moves once into a compact array sorted by move number, then
+    # replay the game once and snapshot the board at each top move, instead
+    # of rebuilding it from move 1 for every GIF
+    parsed = parse_moves(all_moves)
+    board = DrawGoBoard(19)
+    played_upto = 0
+
+    # GIFs are independent, so render them in worker threads (numpy, PIL and
+    # the ffmpeg subprocess do the heavy lifting outside the GIL). The
+    # semaphore bounds how many frame sets are held in memory at once.
+    semaphore = asyncio.Semaphore(GIF_WORKERS)
+
+    async def create_gif(move_data, output_path, board):
+        async with semaphore:
+            await asyncio.to_thread(
+                create_gif_for_move, move_data, all_moves, output_path, board
+            )
+        print(f"GIF created: {os.path.basename(output_path)}")
+
     gif_paths = []
-    for move_data in top_moves:
+    for move_data in sorted(top_moves, key=lambda m: m["move"]):
         move_number = move_data["move"]
         output_filename = f"move_{move_number}.gif"
         output_path = os.path.join(output_dir, output_filename)
 
+        end = np.searchsorted(parsed["move"], move_number)
+        play_parsed_moves(board, parsed[played_upto:end])
+        played_upto = end
+
         # Create GIF
-        create_gif_for_move(move_data, all_moves, output_path)
-        print(f"GIF created: {output_filename}")
+        tasks.append(create_gif(move_data, output_path, board.copy()))
         gif_paths.append(output_path)
 
+    await asyncio.gather(*tasks)
+
     return gif_paths
@@ -1,107 +1,286 @@
+import random
 import sys
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _neighbor_table(size):
+    """
+    每個格子 (索引 r * size + c) 在棋盤內的相鄰格子索引，只算一次。
+    """
+    table = []
+    for r in range(size):
+        for c in range(size):
+            idx = r * size + c
+            neighbors = []
+            if r > 0:
+                neighbors.append(idx - size)
+            if r < size - 1:
+                neighbors.append(idx + size)
+            if c > 0:
+                neighbors.append(idx - 1)
+            if c < size - 1:
+                neighbors.append(idx + 1)
+            table.append(tuple(neighbors))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def _bit_masks(size):
+    """
+    bitboard 擴張用的遮罩：(全盤, 不含最左行, 不含最右行)。
+    位元 r * size + c 代表 (r, c)；左右位移時用來擋掉跨列繞回的位元。
+    """
+    full = (1 << (size * size)) - 1
+    first_col = 0
+    for r in range(size):
+        first_col |= 1 << (r * size)
+    last_col = first_col << (size - 1)
+    return full, full & ~first_col, full & ~last_col
+
+
+@lru_cache(maxsize=None)
+def _zobrist_table(size):
+    """
+    Zobrist 雜湊用的 64-bit 亂數 (固定種子，結果可重現)。
+    table[idx][color]：idx 為 r * size + c，color 為 1(黑) / 2(白)，[0] 固定為 0。
+    """
+    rng = random.Random(0)
+    return tuple(
+        (0, rng.getrandbits(64), rng.getrandbits(64)) for _ in range(size * size)
+    )
+
+
+# 定義圍棋座標的橫軸字母 (跳過 'I')
+_COL_LABELS = "ABCDEFGHJKLMNOPQRST"
+_COL_INDEX = {ch: i for i, ch in enumerate(_COL_LABELS)}
+
+# display() 用：0 空 → "."、1 黑 → "X"、2 白 → "O"
+_DISPLAY_TABLE = bytes.maketrans(b"\x00\x01\x02", b".XO")
+
+
+@lru_cache(maxsize=512)
+def _parse_coord(text, size):
+    """
+    parse_coordinates 的實作：結果只跟輸入字串與棋盤大小有關，直接快取。
+    回傳 (row, col)，格式錯誤回傳 None
+    """
+    text = text.upper().strip()
+    if len(text) < 2:
+        return None
+
+    # 1. 處理字母 (Column)
+    col = _COL_INDEX.get(text[0])
+    if col is None:
+        return None
+
+    # 2. 處理數字 (Row)
+    try:
+        row_num = int(text[1:])
+        # 圍棋座標 1 在最下方 (index 18)，19 在最上方 (index 0)
+        row = size - row_num
+    except ValueError:
+        return None
+
+    if not (0 <= row < size and 0 <= col < size):
+        return None
+
+    return row, col
+
+
+def _bit_indices(bits):
+    """依序列出 bitboard 中為 1 的位元索引"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
 
 
 class GoBoard:
     def __init__(self, size=19):
         self.size = size
-        # 0: 空, 1: 黑, 2: 白
-        self.board = [[0 for _ in range(size)] for _ in range(size)]
+        # 盤面以兩個 bitboard (Python int) 表示：位元 r * size + c 為 1 代表該點有棋子
+        self.black = 0
+        self.white = 0
+        self._full, self._not_first_col, self._not_last_col = _bit_masks(size)
+        self._neighbors = _neighbor_table(size)
+
+        # 盤面的 Zobrist 雜湊：每放上 / 拿掉一顆棋子 XOR 一次。
+        # 記錄下過的每個盤面，用來判斷全局同形 (超級劫)
+        self._zobrist = _zobrist_table(size)
+        self.hash = 0
+        self._history_hashes = {0}
+
+        # 同時維護一份一維 bytearray (0: 空, 1: 黑, 2: 白)，索引為 r * size + c，
+        # 給需要逐點讀取的地方使用 (line_handler / BoardVisualizer / display)
+        self.cells = bytearray(size * size)
+        # 唯讀的二維視圖：self.board[r][c] 讀的就是 self.cells；
+        # 盤面只能透過 place_stone / replay_stone 修改，才能和 bitboard 保持一致
+        view = memoryview(self.cells).toreadonly()
+        self.board = [view[r * size : (r + 1) * size] for r in range(size)]
+        # 同一塊記憶體的 NumPy 二維視圖 (零複製、唯讀)，需要整盤向量化運算時使用
+        self.array = np.frombuffer(self.cells, dtype=np.uint8).reshape(size, size)
+        self.array.flags.writeable = False
 
         # 定義圍棋座標的橫軸字母 (跳過 'I')
-        self.col_labels = "ABCDEFGHJKLMNOPQRST"
+        self.col_labels = _COL_LABELS
 
         # === 新增：紀錄打劫的禁著點 ===
-        # 格式：(row, col) 或 None
-        self.ko_point = None
+        # 格式：索引 row * size + col，沒有禁著點時為 -1
+        self.ko_point = -1
 
     def display(self):
         """
         在 Console 印出目前棋盤 (除錯用)
         """
-        print("   " + " ".join(self.col_labels))
-        for r in range(self.size):
+        N = self.size
+        cells = self.cells
+        header = "   " + " ".join(self.col_labels)
+        lines = [header]
+        for r in range(N):
             # 圍棋盤面通常 19 在最上面，1 在最下面
-            row_label = self.size - r
-            row_str = f"{row_label:2d} "
-            for c in range(self.size):
-                stone = self.board[r][c]
-                if stone == 0:
-                    char = "."
-                elif stone == 1:
-                    char = "X"  # 黑棋
-                elif stone == 2:
-                    char = "O"  # 白棋
-                row_str += char + " "
-            print(row_str + f"{row_label}")
-        print("   " + " ".join(self.col_labels))
+            row_label = N - r
+            # 整列一次轉成 "." / "X" / "O"
+            row = cells[r * N : (r + 1) * N].translate(_DISPLAY_TABLE).decode()
+            lines.append(f"{row_label:2d} {' '.join(row)} {row_label}")
+        lines.append(header)
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def parse_coordinates(self, text):
         """
         將 LINE 使用者輸入的 "D4", "Q16" 轉換為陣列索引 (row, col)
         """
-        text = text.upper().strip()
-        if len(text) < 2:
-            return None
+        return _parse_coord(text, self.size)
+
+    def get_group_and_liberties(self, r, c, max_libs=None):
+        """
+        核心演算法：找出 (r, c) 這顆棋子所在的「整串棋子」以及它們的「氣」。
+        回傳: (棋串座標Set, 氣的數量)
+        max_libs: 只需要知道氣是否超過這個數字時使用；超過就提早結束，
+                  回傳 (None, max_libs + 1)
+        """
+        N = self.size
+        group, libs = self._group_and_liberties(r * N + c, max_libs)
+        if group is None:
+            return None, libs
+        return {divmod(idx, N) for idx in _bit_indices(group)}, libs
+
+    def _group_and_liberties(self, start, max_libs=None):
+        """
+        get_group_and_liberties 的 bitboard 版本：start 為 r * size + c 索引。
+        回傳: (棋串 bitboard, 氣的數量)；超過 max_libs 時為 (None, max_libs + 1)
+        """
+        # 熱點迴圈只用區域變數，不在迴圈內查 self 的屬性
+        black = self.black
+        white = self.white
+        bit = 1 << start
+        if black & bit:
+            same = black
+        elif white & bit:
+            same = white
+        else:
+            return 0, 0
 
-        # 1. 處理字母 (Column)
-        col_char = text[0]
-        if col_char not in self.col_labels:
-            return None
-        col = self.col_labels.index(col_char)
+        # flood fill：整串棋子一次往上下左右擴張一格，只保留同色的點，
+        # 直到棋串不再變大 (每一輪都是幾個大整數位元運算)
+        N = self.size
+        full = self._full
+        not_first = self._not_first_col
+        not_last = self._not_last_col
+        empty = full & ~(black | white)
+        group = bit
+        while True:
+            dilated = (
+                group
+                | ((group << 1) & not_first)
+                | ((group >> 1) & not_last)
+                | ((group << N) & full)
+                | (group >> N)
+            )
+            if max_libs is not None and (dilated & empty).bit_count() > max_libs:
+                return None, max_libs + 1
+            grown = dilated & same
+            if grown == group:
+                break
+            group = grown
 
-        # 2. 處理數字 (Row)
-        try:
-            row_num = int(text[1:])
-            # 圍棋座標 1 在最下方 (index 18)，19 在最上方 (index 0)
-            row = self.size - row_num
-        except ValueError:
-            return None
+        # 氣：棋串往外擴張一格後碰到的空點
+        return group, (dilated & empty).bit_count()
 
-        if not (0 <= row < self.size and 0 <= col < self.size):
-            return None
+    def _put(self, idx, color):
+        """在 idx 放一顆 color 的棋子 (同步更新 bitboard 與 cells)"""
+        bit = 1 << idx
+        if color == 1:
+            self.black |= bit
+            self.white &= ~bit
+        else:
+            self.white |= bit
+            self.black &= ~bit
+        z = self._zobrist[idx]
+        self.hash ^= z[self.cells[idx]] ^ z[color]
+        self.cells[idx] = color
 
-        return row, col
+    def _remove(self, stones):
+        """移除 bitboard stones 上的所有棋子"""
+        self.black &= ~stones
+        self.white &= ~stones
+        cells = self.cells
+        zobrist = self._zobrist
+        h = self.hash
+        for idx in _bit_indices(stones):
+            h ^= zobrist[idx][cells[idx]]
+            cells[idx] = 0
+        self.hash = h
 
-    def get_group_and_liberties(self, r, c):
+    def _capture_and_check(self, idx, color):
         """
-        核心演算法：找出 (r, c) 這顆棋子所在的「整串棋子」以及它們的「氣」。
-        回傳: (棋串座標Set, 氣的數量)
+        idx 已經放上 color 之後：提掉四周氣盡的對手棋串，並計算自己的氣。
+        回傳: (被提掉的棋子 bitboard, 自己的氣 (0 / 1 / 2 代表兩口以上))
+        """
+        opponent_stones = self.white if color == 1 else self.black
+        group_and_liberties = self._group_and_liberties
+        captured = 0
+
+        # 檢查四周對手棋子是否氣絕 (提子邏輯)
+        for nidx in self._neighbors[idx]:
+            bit = 1 << nidx
+            # 已經確定要提掉的棋串不重複搜尋
+            if opponent_stones & bit and not captured & bit:
+                # 只需要知道對手這串棋子是否氣盡，有氣就提早結束
+                group, libs = group_and_liberties(nidx, max_libs=0)
+                if libs == 0:
+                    captured |= group
+
+        # 執行提子 (從棋盤移除)
+        if captured:
+            self._remove(captured)
+
+        # 自殺與打劫只需要分辨 0 / 1 / 2 口以上的氣。
+        # 大部分的落子四周就有兩個以上空點，可以直接判定，不必搜尋整串棋子
+        cells = self.cells
+        empty_neighbors = 0
+        for nidx in self._neighbors[idx]:
+            if cells[nidx] == 0:
+                empty_neighbors += 1
+                if empty_neighbors == 2:
+                    return captured, 2
+        _, my_libs = self._group_and_liberties(idx, max_libs=1)
+        return captured, my_libs
+
+    def _update_ko(self, captured, my_libs):
+        """
+        計算新的打劫禁著點：
+        條件A: 剛才提吃了「正好一顆」子
+        條件B: 自己這顆子下下去後「正好剩一口氣」
+        如果符合，被提吃的那格就是對手下一手的禁著點；
+        否則（例如提吃多子、或自己氣很多）就解除禁手
         """
-        color = self.board[r][c]
-        if color == 0:
-            return set(), 0
-
-        # 使用 BFS (廣度優先搜尋) 找尋相連同色棋子
-        stack = [(r, c)]
-        visited_stones = {(r, c)}  # 記錄這個 group 的所有棋子位置
-        liberties = set()  # 記錄所有氣的位置 (去重複)
-
-        while stack:
-            cur_r, cur_c = stack.pop()
-
-            # 檢查上下左右
-            neighbors = [
-                (cur_r - 1, cur_c),
-                (cur_r + 1, cur_c),
-                (cur_r, cur_c - 1),
-                (cur_r, cur_c + 1),
-            ]
-
-            for nr, nc in neighbors:
-                # 邊界檢查
-                if 0 <= nr < self.size and 0 <= nc < self.size:
-                    neighbor_color = self.board[nr][nc]
-
-                    if neighbor_color == 0:
-                        # 這是氣
-                        liberties.add((nr, nc))
-                    elif neighbor_color == color:
-                        # 是同伴，且沒被訪問過，加入搜尋隊列
-                        if (nr, nc) not in visited_stones:
-                            visited_stones.add((nr, nc))
-                            stack.append((nr, nc))
-
-        return visited_stones, len(liberties)
+        if my_libs == 1 and captured and not captured & (captured - 1):
+            self.ko_point = captured.bit_length() - 1
+        else:
+            self.ko_point = -1
 
     def place_stone(self, coord_text, color):
         """
@@ -115,56 +294,71 @@ class GoBoard:
             return False, "座標格式錯誤 (例如: D4, Q16)"
 
         r, c = coords
+        idx = r * self.size + c
 
-        if self.board[r][c] != 0:
+        if self.cells[idx] != 0:
             return False, "這裡已經有棋子了"
 
         # === 1. 檢查是否為打劫禁著點 (Ko) ===
-        if self.ko_point == (r, c):
+        if self.ko_point == idx:
             return False, "打劫：不能立即回提，請先找劫材！"
 
-        # 嘗試落子 (暫時改變狀態)
-        self.board[r][c] = color
-
-        captured_stones = []
-        opponent = 2 if color == 1 else 1
-
-        # 2. 檢查四周對手棋子是否氣絕 (提子邏輯)
-        neighbors = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
-        for nr, nc in neighbors:
-            if 0 <= nr < self.size and 0 <= nc < self.size:
-                if self.board[nr][nc] == opponent:
-                    # 計算對手這串棋子的氣
-                    group, libs = self.get_group_and_liberties(nr, nc)
-                    if libs == 0:
-                        # 氣盡，加入提子名單
-                        for gr, gc in group:
-                            captured_stones.append((gr, gc))
-
-        # 3. 執行提子 (從棋盤移除)
-        for cr, cc in captured_stones:
-            self.board[cr][cc] = 0
-
-        # 4. 檢查自殺規則 (禁手)
+        # 2. 嘗試落子 (暫時改變狀態)，提掉氣盡的對手棋子
+        self._put(idx, color)
+        captured, my_libs = self._capture_and_check(idx, color)
+
+        # 3. 檢查自殺規則 (禁手)
         # 如果沒有提吃對手，且自己落下後氣為 0，則為自殺 (不允許)
-        my_group, my_libs = self.get_group_and_liberties(r, c)
-        if my_libs == 0 and not captured_stones:
-            self.board[r][c] = 0  # 還原
+        if my_libs == 0 and not captured:
+            self._remove(1 << idx)  # 還原
             return False, "禁手：禁止自殺"
 
+        # 4. 檢查全局同形：落子後的盤面不能和之前出現過的任何盤面相同
+        if self.hash in self._history_hashes:
+            # 還原：拿掉剛下的棋子，放回被提掉的棋子
+            self._remove(1 << idx)
+            opponent = 2 if color == 1 else 1
+            for cidx in _bit_indices(captured):
+                self._put(cidx, opponent)
+            return False, "全局同形：不能讓盤面回到之前出現過的局面！"
+        self._history_hashes.add(self.hash)
+
         # === 5. 計算新的打劫禁著點 (核心邏輯) ===
-        # 條件A: 剛才提吃了「正好一顆」子
-        # 條件B: 自己這顆子下下去後「正好剩一口氣」
-        # 如果符合，被提吃的那格就是對手下一手的禁著點
-        if len(captured_stones) == 1 and my_libs == 1:
-            self.ko_point = captured_stones[0]
-        else:
-            # 如果不是打劫狀態（例如提吃多子、或自己氣很多），就解除禁手
-            self.ko_point = None
+        self._update_ko(captured, my_libs)
 
         # 成功落子
         msg = f"{'黑' if color==1 else '白'}棋落在 {coord_text}。"
-        if captured_stones:
-            msg += f" 提吃了 {len(captured_stones)} 顆子！"
+        if captured:
+            msg += f" 提吃了 {captured.bit_count()} 顆子！"
 
         return True, msg
+
+    def replay_stone(self, r, c, color):
+        """
+        照棋譜落子 (從 SGF 還原盤面用)：不檢查禁手，直接落子並處理提子與打劫。
+        該點已有棋子時直接覆蓋；自殺的棋子也會留在盤面上。
+        回傳: (被提掉的棋子索引 List (r * size + c), 自己的氣 (0 / 1 / 2 代表兩口以上))
+        """
+        idx = r * self.size + c
+        self._put(idx, color)
+        captured, my_libs = self._capture_and_check(idx, color)
+        self._update_ko(captured, my_libs)
+        self._history_hashes.add(self.hash)
+        # 絕大多數的手沒有提子，不必再建 generator 展開
+        if not captured:
+            return [], my_libs
+        return list(_bit_indices(captured)), my_libs
+
+    def copy(self):
+        """
+        複製目前的盤面 (含打劫禁著點與下過的盤面紀錄)，兩者之後各自落子互不影響
+        """
+        other = GoBoard(self.size)
+        other.black = self.black
+        other.white = self.white
+        other.hash = self.hash
+        other._history_hashes = set(self._history_hashes)
+        # 寫進既有的 bytearray，board / array 視圖才會跟著更新
+        other.cells[:] = self.cells
+        other.ko_point = self.ko_point
+        return other
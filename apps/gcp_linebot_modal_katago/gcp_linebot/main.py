@@ -16,7 +16,7 @@ from handlers.sgf_handler import (
 from handlers.draw_handler import draw_all_moves_gif
 from LLM.providers.openai_provider import call_openai
 import asyncio
-import json
+import orjson
 
 
 @asynccontextmanager
@@ -31,7 +31,9 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
-    pass
+    from handlers.line_handler import close_line_bot_api
+
+    await close_line_bot_api()
 
 
 app = FastAPI(title="Go Line Bot Webhook API", lifespan=lifespan)
@@ -50,7 +52,7 @@ app.add_middleware(
 async def webhook(request: Request):
     """LINE Webhook handler"""
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
         events = body.get("events", [])
         print("events", events)
 
@@ -337,9 +339,7 @@ async def process_review_results(
                             batch, start_index, len(all_bubbles)
                         )
                         carousel_contents = carousel_message["contents"]
-                        flex_container = FlexContainer.from_json(
-                            json.dumps(carousel_contents)
-                        )
+                        flex_container = FlexContainer.from_dict(carousel_contents)
                         flex_message = FlexMessage(
                             alt_text=carousel_message["altText"],
                             contents=flex_container,
@@ -402,7 +402,7 @@ async def callback_review(request: Request):
     }
     """
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
         task_id = body.get("task_id")
         status = body.get("status")
         target_id = body.get("target_id")
@@ -484,7 +484,7 @@ async def callback_get_ai_next_move(request: Request):
     }
     """
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
         status = body.get("status")
         target_id = body.get("target_id")
         move = body.get("move")
@@ -658,7 +658,7 @@ async def callback_get_ai_next_move(request: Request):
         with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
             tmp_path = tmp_file.name
 
-        visualizer.draw_board(game.board, last_move=coords, output_filename=tmp_path)
+        visualizer.draw_board(game.array, last_move=coords, output_filename=tmp_path)
 
         # Upload to GCS
         remote_path = f"target_{target_id}/boards/{game_id}/{filename}"
@@ -1,26 +1,25 @@
-import json
 import os
 import asyncio
+import codecs
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, Callable, Dict, Any
+import orjson
 from logger import logger
 
 
-def jsonl_to_json(jsonl_content: str) -> list:
-    """Convert JSONL file content to JSON array"""
-    if not jsonl_content or not isinstance(jsonl_content, str):
-        return []
-
-    # Split by lines, filter empty lines
-    lines = [line.strip() for line in jsonl_content.strip().split("\n") if line.strip()]
-
-    # Parse each line as JSON object
+def parse_jsonl_lines(lines) -> list:
+    """Parse JSONL lines (str or bytes, e.g. an open file) into a JSON array"""
+    # Parse each non-empty line as JSON object
+    # orjson 在 C 裡解析，KataGo 的 moveInfos 巢狀很深時比 json 快好幾倍
     json_array = []
     for index, line in enumerate(lines):
+        if not line.strip():
+            continue
         try:
-            json_array.append(json.loads(line))
-        except json.JSONDecodeError as error:
+            json_array.append(orjson.loads(line))
+        except orjson.JSONDecodeError as error:
             logger.error(
                 f"Error parsing JSONL line {index + 1}: {error}", exc_info=True
             )
@@ -29,12 +28,21 @@ def jsonl_to_json(jsonl_content: str) -> list:
     return json_array
 
 
+def jsonl_to_json(jsonl_content: str) -> list:
+    """Convert JSONL file content to JSON array"""
+    if not jsonl_content or not isinstance(jsonl_content, str):
+        return []
+
+    return parse_jsonl_lines(jsonl_content.splitlines())
+
+
 async def read_jsonl_file(file_path: str) -> list:
     """Read JSONL file and convert to JSON array"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return jsonl_to_json(content)
+        # 逐行讀取邊讀邊解析，不必先把整個檔案讀進記憶體再切行
+        # (orjson 直接吃 UTF-8 bytes，不需要先解碼)
+        with open(file_path, "rb") as f:
+            return parse_jsonl_lines(f)
     except Exception as error:
         logger.error(f"Error reading JSONL file {file_path}: {error}", exc_info=True)
         raise
@@ -57,6 +65,13 @@ def extract_move_stats(response: dict) -> Optional[dict]:
     next_move_color = response.get("nextMoveColor")
     next_root_info = response.get("nextRootInfo", {})
 
+    # Actual move's moveInfo (searched once, used for both winrate_after and score_loss)
+    played_move_info = (
+        next((m for m in move_infos if m.get("move") == next_move), None)
+        if next_move
+        else None
+    )
+
     # winrate_before: win rate before move (current node's win rate)
     # rootInfo.winrate is from current player's perspective (0-1), convert to percentage
     winrate_before = root_info.get("winrate", 0)
@@ -74,18 +89,14 @@ def extract_move_stats(response: dict) -> Optional[dict]:
             if current_player == "B"
             else (1 - next_root_info["winrate"]) * 100
         )
-    elif next_move and len(move_infos) > 0:
+    elif played_move_info and played_move_info.get("winrate") is not None:
         # If no nextRootInfo, try to get from actual move's moveInfo
-        played_move_info = next(
-            (m for m in move_infos if m.get("move") == next_move), None
+        # Correction: use currentPlayer instead of nextPlayer, keep perspective consistent
+        winrate_after = (
+            played_move_info["winrate"] * 100
+            if current_player == "B"
+            else (1 - played_move_info["winrate"]) * 100
         )
-        if played_move_info and played_move_info.get("winrate") is not None:
-            # Correction: use currentPlayer instead of nextPlayer, keep perspective consistent
-            winrate_after = (
-                played_move_info["winrate"] * 100
-                if current_player == "B"
-                else (1 - played_move_info["winrate"]) * 100
-            )
 
     # Calculate actual move and AI best move
     played_move = None
@@ -103,11 +114,6 @@ def extract_move_stats(response: dict) -> Optional[dict]:
         if next_move and next_move_color:
             played_move = next_move
 
-            # Find actual move in moveInfos
-            played_move_info = next(
-                (m for m in move_infos if m.get("move") == next_move), None
-            )
-
             if played_move_info:
                 # score_loss = best move's scoreLead - actual move's scoreLead
                 # Note: scoreLead is from current player's perspective
@@ -247,46 +253,51 @@ async def run_katago_analysis(
         stderr=asyncio.subprocess.PIPE,
     )
 
-    stdout = b""
-    stderr = b""
+    # bytearray.extend 是攤銷 O(1)，不像 bytes += 每次都複製整段輸出
+    stdout = bytearray()
+    stderr = bytearray()
 
     # Capture stdout and stderr concurrently
-    async def read_stdout():
-        nonlocal stdout
-        while True:
-            chunk = await process.stdout.read(1024)
-            if not chunk:
-                break
-            stdout += chunk
-            output = chunk.decode("utf-8", errors="replace")
+    async def read_stream(stream, buffer: bytearray, log_line: Callable[[str], None]):
+        # katawrap 的進度每秒用 "\r" 覆寫同一行、不換行，所以不能用 readline()：
+        # 它會一直等 "\n"，累積超過 StreamReader 的上限就直接丟 ValueError。
+        # 改成固定大小讀取，"\r" 和 "\n" 都當行尾，沒讀完的半行留到下一輪再接上
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+
+        def emit(line: str):
             if on_progress:
-                on_progress(output)
-            else:
+                on_progress(line)
+            elif line.strip():
                 # If no progress callback, log to logger in real-time
-                # Process each line separately for better readability
-                for line in output.splitlines():
-                    if line.strip():
-                        logger.info(f"KataGo: {line.strip()}")
+                log_line(line.strip())
 
-    async def read_stderr():
-        nonlocal stderr
         while True:
-            chunk = await process.stderr.read(1024)
+            chunk = await stream.read(4096)
             if not chunk:
                 break
-            stderr += chunk
-            output = chunk.decode("utf-8", errors="replace")
-            if on_progress:
-                on_progress(output)
-            else:
-                # If no progress callback, log to logger in real-time
-                # Process each line separately for better readability
-                for line in output.splitlines():
-                    if line.strip():
-                        logger.warning(f"KataGo stderr: {line.strip()}")
+            buffer.extend(chunk)
+            lines = (pending + decoder.decode(chunk)).splitlines(keepends=True)
+            # 最後一段沒有行尾的話是還沒寫完的半行
+            pending = lines.pop() if lines and not lines[-1].endswith(("\r", "\n")) else ""
+            for line in lines:
+                emit(line)
+
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            emit(pending)
 
     # Read both streams concurrently
-    await asyncio.gather(read_stdout(), read_stderr())
+    await asyncio.gather(
+        read_stream(
+            process.stdout, stdout, lambda line: logger.info(f"KataGo: {line}")
+        ),
+        read_stream(
+            process.stderr,
+            stderr,
+            lambda line: logger.warning(f"KataGo stderr: {line}"),
+        ),
+    )
 
     # Wait for process to complete
     return_code = await process.wait()
@@ -310,8 +321,9 @@ async def run_katago_analysis(
                 json_dir = jsonl_path.parent
                 json_path = json_dir / f"{jsonl_basename}.json"
 
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(move_stats, f, indent=2, ensure_ascii=False)
+                # orjson 輸出的就是 UTF-8 bytes (不會跳脫非 ASCII 字元)
+                with open(json_path, "wb") as f:
+                    f.write(orjson.dumps(move_stats, option=orjson.OPT_INDENT_2))
 
                 logger.info(f"Move stats JSON saved: {json_path}")
                 logger.info(
@@ -439,8 +451,8 @@ async def run_katago_analysis_evaluation(
                 if not line:
                     continue
                 try:
-                    last_obj = json.loads(line)
-                except json.JSONDecodeError as e:
+                    last_obj = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
                     logger.warning(f"Skip invalid JSONL line in evaluation: {e}")
                     continue
     except Exception as error:
@@ -516,6 +528,123 @@ async def run_katago_analysis_evaluation(
     }
 
 
+class _GtpEngine:
+    """常駐的 KataGo GTP 行程：模型只在啟動時載入一次，之後每個請求只送 GTP 指令"""
+
+    def __init__(self, katago_cmd: list, cwd: str):
+        self.katago_cmd = katago_cmd
+        self.cwd = cwd
+        self.process: Optional[asyncio.subprocess.Process] = None
+        # 行程綁定在建立它的 event loop 上 (modal 每次呼叫都用新的 asyncio.run)
+        self.loop = asyncio.get_running_loop()
+        # GTP 是一問一答，同一時間只能有一個請求跟這個行程對話
+        self.lock = asyncio.Lock()
+        # 最後幾行 stderr，行程意外結束時放進錯誤訊息
+        self.stderr_tail = deque(maxlen=50)
+        self._stderr_task: Optional[asyncio.Task] = None
+        # 引擎盤面目前的手順 ("play B D4", ...)；None 表示不確定，下次要從 clear_board 重擺
+        self.played_moves: Optional[list] = None
+
+    def is_usable(self) -> bool:
+        if self.loop is not asyncio.get_running_loop():
+            return False
+        return self.process is None or self.process.returncode is None
+
+    async def ensure_started(self):
+        if self.process is not None:
+            return
+        logger.info(f"Starting KataGo GTP engine: {' '.join(self.katago_cmd)}")
+        self.process = await asyncio.create_subprocess_exec(
+            *self.katago_cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+        )
+        # stderr 要一直讀掉，不然管線塞滿之後 KataGo 會卡住
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+    async def _drain_stderr(self):
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            self.stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+
+    async def send(self, commands: list) -> list:
+        """Send GTP commands, return one (status, text) per command ('=' ok / '?' error)"""
+        gtp_input = "".join(f"{command}\n" for command in commands)
+        logger.debug(f"Sending GTP commands:\n{gtp_input}")
+        self.process.stdin.write(gtp_input.encode("utf-8"))
+        await self.process.stdin.drain()
+        return [await self._read_response() for _ in commands]
+
+    async def _read_response(self) -> tuple:
+        # GTP response format: "= <text>" or "? <error>", terminated by an empty line
+        status = None
+        text_lines = []
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                stderr_text = "\n".join(self.stderr_tail)
+                raise RuntimeError(f"KataGo GTP process exited\n{stderr_text}")
+            line = line.decode("utf-8", errors="replace").strip()
+            if status is None:
+                if line[:1] in ("=", "?"):
+                    status = line[0]
+                    text_lines.append(line[1:].strip())
+            elif line:
+                text_lines.append(line)
+            else:
+                return status, "\n".join(text_lines).strip()
+
+    def close(self):
+        try:
+            if self._stderr_task is not None and not self._stderr_task.done():
+                self._stderr_task.cancel()
+            if self.process is not None and self.process.returncode is None:
+                self.process.kill()
+        except (ProcessLookupError, RuntimeError):
+            pass
+
+
+# KataGo 指令 (model / config / visits) -> 常駐的 GTP 行程
+_gtp_engines: Dict[tuple, _GtpEngine] = {}
+
+
+def _get_gtp_engine(katago_cmd: list, cwd: str) -> _GtpEngine:
+    """Get (or create) the shared GTP engine for this command line"""
+    key = tuple(katago_cmd)
+    engine = _gtp_engines.get(key)
+    if engine is not None and engine.is_usable():
+        return engine
+    if engine is not None:
+        engine.close()
+    # 這裡沒有 await，同時進來的請求會拿到同一個 engine，再由 engine.lock 排隊
+    engine = _GtpEngine(katago_cmd, cwd)
+    _gtp_engines[key] = engine
+    return engine
+
+
+def _discard_gtp_engine(engine: _GtpEngine):
+    """Kill an engine that failed mid-conversation so the next request starts a fresh one"""
+    key = tuple(engine.katago_cmd)
+    if _gtp_engines.get(key) is engine:
+        del _gtp_engines[key]
+    engine.close()
+
+
+async def close_gtp_engines():
+    """Stop all cached KataGo GTP processes (called on shutdown)"""
+    engines = list(_gtp_engines.values())
+    _gtp_engines.clear()
+    for engine in engines:
+        engine.close()
+        # 等行程真的結束，transport 才會在 event loop 關閉前收乾淨
+        if engine.process is not None and engine.loop is asyncio.get_running_loop():
+            await engine.process.wait()
+
+
 async def run_katago_gtp_next_move(
     sgf_path: str,
     current_turn: int,
@@ -575,17 +704,9 @@ async def run_katago_gtp_next_move(
         katago_cmd.extend(["-override-config", f"maxVisits={visits}"])
     
     logger.info(f"Running KataGo GTP command: {' '.join(katago_cmd)}")
+    engine = _get_gtp_engine(katago_cmd, str(project_root))
     
     try:
-        # Start KataGo process
-        process = await asyncio.create_subprocess_exec(
-            *katago_cmd,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=str(project_root),
-        )
-        
         # Read SGF file content
         with open(sgf_path, "rb") as f:
             sgf_content = f.read()
@@ -595,14 +716,8 @@ async def run_katago_gtp_next_move(
         sgf_game = sgf.Sgf_game.from_bytes(sgf_content)
         sequence = sgf_game.get_main_sequence()
         
-        # Send GTP commands to set up the board
-        gtp_commands = []
-        
-        # Clear board
-        gtp_commands.append("boardsize 19\n")
-        gtp_commands.append("clear_board\n")
-        
         # Play all moves from SGF
+        play_commands = []
         for node in sequence:
             color_move, move = node.get_move()
             if move is not None:
@@ -620,94 +735,61 @@ async def run_katago_gtp_next_move(
                 gtp_move = f"{gtp_col}{gtp_row}"
                 
                 gtp_color = "B" if color_move == "b" else "W"
-                gtp_commands.append(f"play {gtp_color} {gtp_move}\n")
-        
-        # Get next move
-        gtp_commands.append(f"genmove {color}\n")
-        gtp_commands.append("quit\n")
-        
-        # Send all commands
-        gtp_input = "".join(gtp_commands)
-        logger.debug(f"Sending GTP commands:\n{gtp_input}")
-        
-        stdout, stderr = await process.communicate(input=gtp_input.encode('utf-8'))
-        
-        return_code = await process.wait()
-        
-        stdout_text = stdout.decode('utf-8', errors='replace')
-        stderr_text = stderr.decode('utf-8', errors='replace')
-        
-        logger.info(f"KataGo GTP stdout (first 1000 chars):\n{stdout_text[:1000]}")
-        logger.info(f"KataGo GTP stderr (first 1000 chars):\n{stderr_text[:1000]}")
-        
-        if return_code != 0:
-            error_msg = f"KataGo GTP failed with exit code {return_code}\n{stderr_text}"
-            logger.error(error_msg)
-            return {"success": False, "error": error_msg}
-        
-        # Parse output to find genmove response
-        # GTP response format: "= <move>\n" or "? <error>\n"
-        # KataGo outputs responses for each command, we need to find the genmove response
-        lines = stdout_text.split('\n')
-        move = None
-        error_response = None
-        
-        # Collect all responses (lines starting with = or ?)
-        responses = []
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            if line_stripped.startswith('='):
-                response_text = line_stripped[1:].strip()
-                responses.append(('=', response_text, i))
-                logger.debug(f"Found response at line {i}: = {response_text}")
-            elif line_stripped.startswith('?'):
-                response_text = line_stripped[1:].strip()
-                responses.append(('?', response_text, i))
-                logger.debug(f"Found error response at line {i}: ? {response_text}")
-        
-        logger.info(f"Found {len(responses)} GTP responses in output")
-        
-        # Find the last genmove command position
-        last_genmove_line = -1
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            if "genmove" in line_stripped.lower() and not line_stripped.startswith('='):
-                last_genmove_line = i
-                logger.debug(f"Found genmove command at line {i}: {line_stripped}")
-        
-        # Find the response after the last genmove command
-        if last_genmove_line >= 0:
-            for resp_type, resp_text, resp_line in responses:
-                if resp_line > last_genmove_line:
-                    if resp_type == '=':
-                        move = resp_text
-                        logger.info(f"Found genmove response at line {resp_line}: '{move}'")
-                        break
-                    elif resp_type == '?':
-                        error_response = resp_text
-                        logger.error(f"Found genmove error response at line {resp_line}: {error_response}")
-                        break
-        
-        # Fallback: if we didn't find a response after genmove, use the last non-empty = response
-        # (genmove should be the last command before quit, so its response should be the last non-empty = response)
-        if not move and not error_response and responses:
-            # Get the last non-empty = response (should be genmove response, quit returns empty)
-            for resp_type, resp_text, resp_line in reversed(responses):
-                if resp_type == '=' and resp_text.strip():  # Only use non-empty responses
-                    move = resp_text
-                    logger.info(f"Using last non-empty = response at line {resp_line} as genmove: '{move}'")
-                    break
-                elif resp_type == '?':
-                    error_response = resp_text
-                    logger.error(f"Last response is error at line {resp_line}: {error_response}")
-                    break
+                play_commands.append(f"play {gtp_color} {gtp_move}")
         
+        async with engine.lock:
+            played_moves = engine.played_moves
+            if played_moves is not None and play_commands[: len(played_moves)] == played_moves:
+                # 引擎上的局面是這盤棋的前段 (通常就是上次 AI 下完那一手)，只補後面幾手
+                gtp_commands = play_commands[len(played_moves) :]
+            else:
+                # 換了一盤棋 / 悔過棋：從空盤重擺
+                gtp_commands = ["boardsize 19", "clear_board"] + play_commands
+
+            # Get next move (不送 quit，行程留給下一個請求)
+            gtp_commands.append(f"genmove {color}")
+            logger.info(
+                f"Sending {len(gtp_commands) - 1} setup command(s) to the KataGo GTP engine"
+            )
+
+            # 送出前先標成不確定，中途出錯就會從 clear_board 重來
+            engine.played_moves = None
+            try:
+                await engine.ensure_started()
+                responses = await engine.send(gtp_commands)
+            except BaseException:
+                # 對話中途出錯 (或請求被取消)，行程的輸出已經對不上指令了，直接換一個新的
+                _discard_gtp_engine(engine)
+                raise
+
+            # 每個指令剛好對應一個回應，最後一個就是 genmove 的
+            setup_failed = False
+            for (resp_type, resp_text), command in zip(responses[:-1], gtp_commands):
+                if resp_type == "?":
+                    setup_failed = True
+                    logger.warning(f"GTP command '{command}' failed: {resp_text}")
+
+            move = None
+            error_response = None
+            resp_type, resp_text = responses[-1]
+            if resp_type == "=":
+                move = resp_text
+                logger.info(f"Found genmove response: '{move}'")
+            else:
+                error_response = resp_text
+                logger.error(f"Found genmove error response: {error_response}")
+
+            # 記下引擎盤面現在的手順：genmove 成功時引擎自己也下了那一手 (resign 不會)
+            if not setup_failed and not error_response:
+                engine.played_moves = play_commands + (
+                    [f"play {color} {move}"] if move and move.lower() != "resign" else []
+                )
+
         if error_response:
             return {"success": False, "error": error_response}
         
         if not move:
-            error_msg = f"Could not find move in KataGo GTP output. Full stdout:\n{stdout_text}\nFull stderr:\n{stderr_text}"
-            logger.error(error_msg)
+            logger.error(f"Empty genmove response from KataGo GTP: {responses[-1]}")
             return {"success": False, "error": "Could not find move in KataGo GTP output"}
         
         # Handle special moves
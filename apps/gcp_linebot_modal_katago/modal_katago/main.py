@@ -687,17 +687,26 @@ def get_ai_next_move(
             os.environ["KATAGO_MODEL"] = str(model_path)
             log(f"Using model from Volume: {model_path}")
 
-            from handlers.katago_handler import run_katago_gtp_next_move, run_katago_analysis_evaluation
+            from handlers.katago_handler import (
+                run_katago_gtp_next_move,
+                run_katago_analysis_evaluation,
+                close_gtp_engines,
+            )
+
+            async def _gtp_next_move():
+                # 每次呼叫都是新的 asyncio.run，GTP 行程留不到下一次，用完就關掉
+                try:
+                    return await run_katago_gtp_next_move(
+                        str(local_sgf_path),
+                        current_turn=current_turn,
+                        visits=visits,
+                    )
+                finally:
+                    await close_gtp_engines()
 
             # Execute KataGo GTP to get next move
             log(f"Starting KataGo GTP for next move")
-            result = asyncio.run(
-                run_katago_gtp_next_move(
-                    str(local_sgf_path),
-                    current_turn=current_turn,
-                    visits=visits,
-                )
-            )
+            result = asyncio.run(_gtp_next_move())
 
             if not result.get("success"):
                 error_msg = result.get("error", "Unknown error")
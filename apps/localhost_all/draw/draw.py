@@ -7,6 +7,7 @@
 import json
 import sys
 import os
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 import imageio
@@ -47,6 +48,22 @@ def coord_to_gtp(x, y):
     return f"{letter}{number}"
 
 
+@lru_cache(maxsize=None)
+def _neighbor_table(size):
+    """每个位置 (x, y) 在棋盘内的相邻位置，table[y][x] 为 ((nx, ny), ...)"""
+    return tuple(
+        tuple(
+            tuple(
+                (x + dx, y + dy)
+                for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                if 0 <= x + dx < size and 0 <= y + dy < size
+            )
+            for x in range(size)
+        )
+        for y in range(size)
+    )
+
+
 class GoBoard:
     """围棋棋盘类"""
 
@@ -54,6 +71,7 @@ class GoBoard:
         self.size = size
         self.board = [[None for _ in range(size)] for _ in range(size)]
         self.move_history = []  # 记录所有走子历史
+        self._neighbors = _neighbor_table(size)
 
     def place_stone(self, x, y, color):
         """放置棋子，并处理提子"""
@@ -86,13 +104,8 @@ class GoBoard:
         return None
 
     def _get_neighbors(self, x, y):
-        """获取相邻位置"""
-        neighbors = []
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.size and 0 <= ny < self.size:
-                neighbors.append((nx, ny))
-        return neighbors
+        """获取相邻位置（查预先算好的表）"""
+        return self._neighbors[y][x]
 
     def _has_liberty(self, x, y, color):
         """检查一个棋子或一组棋子是否有气"""
@@ -1,9 +1,15 @@
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import os
+import threading
 from pathlib import Path
 
 
 class BoardVisualizer:
+    # PNG 的 zlib 壓縮等級。畫一張棋盤的時間幾乎都花在 PNG 編碼上：預設的 6 要
+    # 150-250ms，1 可以少掉 40-100ms；檔案會大 20-60%，像素完全相同
+    PNG_COMPRESS_LEVEL = 1
+
     def __init__(self, assets_dir="assets"):
         """
         初始化：載入圖片素材並設定關鍵測量值
@@ -61,6 +67,28 @@ class BoardVisualizer:
         self.offset_x = stone_diameter // 2
         self.offset_y = stone_diameter // 2
 
+        # 每個交叉點貼棋子的像素座標固定不變，先算好整張表，畫圖時直接查
+        self._paste_coords = [
+            [self.get_pixel_coords(r, c) for c in range(19)] for r in range(19)
+        ]
+
+        # --- 4. 手順數字用的字體 (只載入一次，每次畫圖共用) ---
+        # 嘗試載入字體，如果失敗則使用預設字體
+        try:
+            # 嘗試使用系統字體
+            self.move_number_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 16)
+        except:
+            try:
+                self.move_number_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
+            except:
+                # 使用預設字體
+                self.move_number_font = ImageFont.load_default()
+        # FreeType 字體物件不保證可以跨執行緒同時使用，畫手順數字時要先取得這把鎖
+        self._font_lock = threading.Lock()
+
+        # 初始化之後所有屬性都只會被讀取，draw_board 只在自己的 canvas 副本上作畫，
+        # 所以同一個實例可以讓多個請求 (執行緒) 同時使用
+
     def get_pixel_coords(self, r, c):
         """
         輔助函式：將陣列索引 (row, col) 轉為像素座標 (paste_x, paste_y)
@@ -80,83 +108,73 @@ class BoardVisualizer:
         territory=None,
     ):
         """
-        :param board_state: 19x19 二維陣列
+        :param board_state: 19x19 二維陣列 (GoBoard.array 或二維 list)
         :param last_move: Tuple (row, col) 代表最後一手的位置，若無則傳入 None
         :param output_filename: 檔名
         :param move_numbers: Dict {(row, col): move_number} 標註每手棋的手順
         """
         canvas = self.base_img.copy()
         size = 19
+        # 統一成 uint8 的 NumPy 陣列；傳入 GoBoard.array 時不會複製
+        board_state = np.asarray(board_state, dtype=np.uint8)
 
         # 1. 先畫所有「普通」棋子
-        for r in range(size):
-            for c in range(size):
-                stone_color = board_state[r][c]
-                if stone_color == 0:
-                    continue
-
-                # 如果這個位置是 last_move，我們先跳過不畫？
-                # 不，通常建議先畫普通棋子當底，最後再蓋上 last_move 標記比較保險，
-                # 除非你的 last_move 圖片本身就是一顆完整的棋子。
-                # 這裡我們採取：先畫所有棋子，最後再覆蓋 last_move。
-
-                stone_img = self.b_stone if stone_color == 1 else self.w_stone
-                px, py = self.get_pixel_coords(r, c)
-                canvas.paste(stone_img, (px, py), stone_img)
+        # np.nonzero 直接找出有棋子的點，不必逐格掃過空點
+        rows, cols = np.nonzero(board_state)
+        colors = board_state[rows, cols]
+        paste = canvas.paste
+        paste_coords = self._paste_coords
+        b_stone, w_stone = self.b_stone, self.w_stone
+        for r, c, stone_color in zip(rows.tolist(), cols.tolist(), colors.tolist()):
+            # 如果這個位置是 last_move，我們先跳過不畫？
+            # 不，通常建議先畫普通棋子當底，最後再蓋上 last_move 標記比較保險，
+            # 除非你的 last_move 圖片本身就是一顆完整的棋子。
+            # 這裡我們採取：先畫所有棋子，最後再覆蓋 last_move。
+
+            stone_img = b_stone if stone_color == 1 else w_stone
+            paste(stone_img, paste_coords[r][c], stone_img)
 
         # 2. ### 領地：實心正方形；有棋子且屬對方領地時在棋子上畫小正方形（被吃掉）
         if territory is not None:
             try:
-                overlay = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
-                draw_territory = ImageDraw.Draw(overlay)
+                # 領地標記都是不透明的純色，直接畫在 canvas 上，
+                # 不必再開一張整張大小的透明圖層做 alpha_composite
+                draw_territory = ImageDraw.Draw(canvas)
                 # 實心正方形邊長的一半（空點上的領地）
                 half_side = int(self.GRID_SIZE * 0.2)
                 # 棋子上「被吃」標記的小正方形邊長的一半
                 half_side_captured = int(self.GRID_SIZE * 0.2)
 
-                for r in range(size):
-                    for c in range(size):
-                        if (
-                            r < 0
-                            or r >= len(territory)
-                            or c < 0
-                            or c >= len(territory[r])
-                        ):
-                            continue
-                        t = territory[r][c]
-                        if t not in (1, 2):
-                            continue
-
-                        center_x = self.MARGIN_X + (c * self.GRID_SIZE)
-                        center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
-                        stone_color = board_state[r][c]
+                territory = np.asarray(territory, dtype=np.uint8)[:size, :size]
+                # 只走訪有標記領地的點 (1=黑地, 2=白地)
+                t_rows, t_cols = np.nonzero((territory == 1) | (territory == 2))
+                for r, c in zip(t_rows.tolist(), t_cols.tolist()):
+                    t = territory[r, c]
+                    center_x = self.MARGIN_X + (c * self.GRID_SIZE)
+                    center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
+                    stone_color = board_state[r, c]
+
+                    if stone_color == 0:
+                        # 空點：畫實心正方形領地
+                        half = half_side
+                    elif (t == 1 and stone_color == 2) or (t == 2 and stone_color == 1):
+                        # 有棋子：若領地為對方（算被吃掉），在棋子上畫小實心正方形
+                        # t==1 黑地、t==2 白地；stone 1=黑 2=白
+                        half = half_side_captured
+                    else:
+                        continue
+
+                    color = (0, 0, 0, 255) if t == 1 else (255, 255, 255, 255)
+                    draw_territory.rectangle(
+                        (
+                            center_x - half,
+                            center_y - half,
+                            center_x + half,
+                            center_y + half,
+                        ),
+                        fill=color,
+                    )
 
-                        if stone_color == 0:
-                            # 空點：畫實心正方形領地
-                            left = center_x - half_side
-                            top = center_y - half_side
-                            right = center_x + half_side
-                            bottom = center_y + half_side
-                            if t == 1:
-                                color = (0, 0, 0, 255)
-                            else:
-                                color = (255, 255, 255, 255)
-                            draw_territory.rectangle((left, top, right, bottom), fill=color)
-                        else:
-                            # 有棋子：若領地為對方（算被吃掉），在棋子上畫小實心正方形
-                            # t==1 黑地、t==2 白地；stone 1=黑 2=白
-                            if (t == 1 and stone_color == 2) or (t == 2 and stone_color == 1):
-                                left = center_x - half_side_captured
-                                top = center_y - half_side_captured
-                                right = center_x + half_side_captured
-                                bottom = center_y + half_side_captured
-                                if t == 1:
-                                    color = (0, 0, 0, 255)
-                                else:
-                                    color = (255, 255, 255, 255)
-                                draw_territory.rectangle((left, top, right, bottom), fill=color)
-
-                canvas = Image.alpha_composite(canvas.convert("RGBA"), overlay)
                 canvas = canvas.convert("RGB")
             except Exception:
                 # 領地繪圖失敗時不要影響主流程
@@ -181,45 +199,39 @@ class BoardVisualizer:
         # 4. ### 新增：標註手順 (Move Numbers)
         if move_numbers:
             draw = ImageDraw.Draw(canvas)
-            # 嘗試載入字體，如果失敗則使用預設字體
-            try:
-                # 嘗試使用系統字體
-                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 16)
-            except:
-                try:
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-                except:
-                    # 使用預設字體
-                    font = ImageFont.load_default()
-            
-            for (r, c), move_num in move_numbers.items():
-                if 0 <= r < size and 0 <= c < size and board_state[r][c] != 0:
-                    # 取得棋子中心座標
-                    center_x = self.MARGIN_X + (c * self.GRID_SIZE)
-                    center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
+            font = self.move_number_font
+
+            with self._font_lock:
+                for (r, c), move_num in move_numbers.items():
+                    if 0 <= r < size and 0 <= c < size and board_state[r][c] != 0:
+                        # 取得棋子中心座標
+                        center_x = self.MARGIN_X + (c * self.GRID_SIZE)
+                        center_y = self.MARGIN_Y + (r * self.GRID_SIZE)
                     
-                    # 根據棋子顏色選擇文字顏色
-                    stone_color = board_state[r][c]
-                    text_color = "white" if stone_color == 1 else "black"
+                        # 根據棋子顏色選擇文字顏色
+                        stone_color = board_state[r][c]
+                        text_color = "white" if stone_color == 1 else "black"
                     
-                    # 計算文字位置（居中）
-                    text = str(move_num)
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    text_x = center_x - text_width // 2
-                    text_y = center_y - text_height // 2
+                        # 計算文字位置（居中）
+                        text = str(move_num)
+                        bbox = draw.textbbox((0, 0), text, font=font)
+                        text_width = bbox[2] - bbox[0]
+                        text_height = bbox[3] - bbox[1]
+                        text_x = center_x - text_width // 2
+                        text_y = center_y - text_height // 2
                     
-                    # 繪製文字（帶有輕微的描邊以提高可讀性）
-                    # 先畫描邊（黑色或白色）
-                    outline_color = "black" if text_color == "white" else "white"
-                    for adj_x in [-1, 0, 1]:
-                        for adj_y in [-1, 0, 1]:
-                            if adj_x != 0 or adj_y != 0:
-                                draw.text((text_x + adj_x, text_y + adj_y), text, font=font, fill=outline_color)
-                    # 再畫主文字
-                    draw.text((text_x, text_y), text, font=font, fill=text_color)
+                        # 繪製文字（帶有輕微的描邊以提高可讀性）
+                        # 先畫描邊（黑色或白色）
+                        outline_color = "black" if text_color == "white" else "white"
+                        for adj_x in [-1, 0, 1]:
+                            for adj_y in [-1, 0, 1]:
+                                if adj_x != 0 or adj_y != 0:
+                                    draw.text((text_x + adj_x, text_y + adj_y), text, font=font, fill=outline_color)
+                        # 再畫主文字
+                        draw.text((text_x, text_y), text, font=font, fill=text_color)
 
         # 儲存
-        canvas.save(output_filename, format="PNG")
+        canvas.save(
+            output_filename, format="PNG", compress_level=self.PNG_COMPRESS_LEVEL
+        )
         return output_filename
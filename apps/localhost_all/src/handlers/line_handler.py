@@ -1,14 +1,16 @@
 import os
 import re
-import json
 import time
 import asyncio
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import quote, urlparse
 from linebot.v3.messaging import (
     Configuration,
     ApiClient,
-    MessagingApi,
+    AsyncApiClient,
+    AsyncMessagingApi,
     MessagingApiBlob,
     ReplyMessageRequest,
     PushMessageRequest,
@@ -24,7 +26,11 @@ from sgfmill import sgf
 
 from config import config
 from logger import logger
-from handlers.katago_handler import run_katago_analysis, run_katago_analysis_evaluation
+from handlers.katago_handler import (
+    run_katago_analysis,
+    run_katago_analysis_evaluation,
+    run_katago_gtp_next_move,
+)
 from handlers.sgf_handler import filter_critical_moves, get_top_winrate_diff_moves
 from handlers.draw_handler import draw_all_moves_gif
 from LLM.providers.openai_provider import call_openai
@@ -34,9 +40,31 @@ from handlers.board_visualizer import BoardVisualizer
 # Initialize LINE Bot API v3
 configuration = Configuration(access_token=config["line"]["channel_access_token"])
 api_client = ApiClient(configuration)
-line_bot_api = MessagingApi(api_client)
 blob_api = MessagingApiBlob(api_client)
 
+# 回覆 / 推播訊息用非同步 (aiohttp) 的 client，不必每次都佔用一個 thread pool worker；
+# aiohttp 的 session 要在 event loop 裡建立，所以第一次使用時才建立
+_async_api_client: Optional[AsyncApiClient] = None
+_line_bot_api: Optional[AsyncMessagingApi] = None
+
+
+def get_line_bot_api() -> AsyncMessagingApi:
+    """Shared async Messaging API client (created on first use inside the event loop)"""
+    global _async_api_client, _line_bot_api
+    if _line_bot_api is None:
+        _async_api_client = AsyncApiClient(configuration)
+        _line_bot_api = AsyncMessagingApi(_async_api_client)
+    return _line_bot_api
+
+
+async def close_line_bot_api():
+    """Close the async Messaging API client (called on app shutdown)"""
+    global _async_api_client, _line_bot_api
+    if _async_api_client is not None:
+        await _async_api_client.close()
+        _async_api_client = None
+        _line_bot_api = None
+
 
 current_sgf_file_name: Optional[str] = None
 bot_user_id: Optional[str] = None
@@ -65,9 +93,8 @@ visualizer = BoardVisualizer(assets_dir=str(assets_dir))
 async def init_bot_user_id():
     global bot_user_id, bot_display_name
     try:
-        # Run synchronous call in thread pool
         # get_bot_info doesn't require a request object in v3 API
-        bot_info = await asyncio.to_thread(line_bot_api.get_bot_info)
+        bot_info = await get_line_bot_api().get_bot_info()
         bot_user_id = bot_info.user_id
         bot_display_name = bot_info.display_name
         logger.info(f"Bot User ID: {bot_user_id}, Display Name: {bot_display_name}")
@@ -81,7 +108,7 @@ async def get_bot_display_name() -> Optional[str]:
     if bot_display_name is None:
         # If not initialized, try to get it
         try:
-            bot_info = await asyncio.to_thread(line_bot_api.get_bot_info)
+            bot_info = await get_line_bot_api().get_bot_info()
             bot_display_name = bot_info.display_name
             logger.debug(f"Bot Display Name: {bot_display_name}")
         except Exception as error:
@@ -95,22 +122,115 @@ def is_valid_https_url(url: str) -> bool:
     if not url or not isinstance(url, str):
         return False
 
-    try:
-        from urllib.parse import urlparse
+    # 常見情況 (GCS 公開網址) 直接比對前綴，不必建立 ParseResult
+    if url.startswith("https://"):
+        return True
 
+    # 其他寫法 (例如大寫的 HTTPS://) 仍交給 urlparse 判斷 scheme
+    try:
         parsed = urlparse(url)
         return parsed.scheme == "https"
     except Exception:
         return False
 
 
+# Command patterns used by handle_text_message (compiled once at import)
+# Board coordinates like "D4", "Q16" (skips 'I')
+_COORD_RE = re.compile(r"^[A-HJ-T]([1-9]|1[0-9])$")
+_LOAD_GAME_MOVES_RE = re.compile(r"(?:讀取|load)\s+(game_\d+)\s+(\d+)", re.IGNORECASE)
+_LOAD_GAME_RE = re.compile(r"(?:讀取|load)\s*(game_\d+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=8)
+def _text_mention_re(bot_display_name: str) -> re.Pattern:
+    """Pattern for text mentions "@{bot_display_name} command" (desktop LINE)"""
+    # Escape special regex characters in bot display name
+    return re.compile(rf"^@{re.escape(bot_display_name)}\s+(.+)$", re.IGNORECASE)
+
+
+# 整句 (轉小寫後) 完全相同才觸發的指令
+_EXACT_COMMANDS = {
+    "help": "help",
+    "幫助": "help",
+    "說明": "help",
+    "覆盤": "review",
+    "review": "review",
+    "形勢": "evaluation",
+    "形式": "evaluation",
+    "evaluation": "evaluation",
+    "對弈": "vs",
+    "vs": "vs",
+    "對弈 ai": "vs_ai",
+    "對弈ai": "vs_ai",
+    "vs ai": "vs_ai",
+    "vsai": "vs_ai",
+    "對弈 free": "vs_free",
+    "對弈free": "vs_free",
+    "vs free": "vs_free",
+    "vsfree": "vs_free",
+}
+
+# 句子裡出現就觸發的關鍵字，一次 regex 掃描全部找出來
+_KEYWORD_COMMANDS = {
+    "悔棋": "undo",
+    "undo": "undo",
+    "讀取": "load",
+    "load": "load",
+    "投子": "resign",
+    "重置": "reset",
+    "reset": "reset",
+}
+_KEYWORD_RE = re.compile("|".join(map(re.escape, _KEYWORD_COMMANDS)))
+# 同一句出現多個關鍵字時的優先順序 (投子 > 重置 > 悔棋 > 讀取)
+_KEYWORD_PRIORITY = ("resign", "reset", "undo", "load")
+
+
+def _parse_command(text: str) -> Optional[str]:
+    """Map a message to its command name ("help", "undo", ...), or None"""
+    text_lower = text.lower()
+    command = _EXACT_COMMANDS.get(text_lower)
+    if command is not None:
+        return command
+    found = {_KEYWORD_COMMANDS[m.group()] for m in _KEYWORD_RE.finditer(text_lower)}
+    for command in _KEYWORD_PRIORITY:
+        if command in found:
+            return command
+    return None
+
+
+# quote(part, safe="") 不會改動的字元 (加上路徑分隔的 /)
+_URL_SAFE_RE = re.compile(r"[A-Za-z0-9\-._~/]*")
+
+
 def encode_url_path(path: str) -> str:
     """Encode URL path (preserve slashes, encode other special characters)"""
-    from urllib.parse import quote
+    # 一般 GCS 路徑 (target_xxx/boards/...) 本來就不需要編碼，直接回傳
+    if path.isascii() and _URL_SAFE_RE.fullmatch(path):
+        return path
 
     return "/".join(quote(part, safe="") for part in path.split("/"))
 
 
+# Static parts of the move-review bubble, built once and shared by every call.
+# The dicts are only serialized, never mutated, so sharing them is safe.
+_COLOR_GREEN = "#1DB446"
+_COLOR_RED = "#FF6B6B"
+_COLOR_TEAL = "#4ECDC4"
+_SEPARATOR_MD = {"type": "separator", "margin": "md"}
+_HERO_IMAGE_TEMPLATE = {
+    "type": "image",
+    "size": "full",
+    "aspectRatio": "1:1",
+    "aspectMode": "cover",
+}
+_FOOTER_BUTTON_TEMPLATE = {
+    "type": "button",
+    "style": "primary",
+    "height": "sm",
+    "color": _COLOR_GREEN,
+}
+
+
 def create_video_preview_bubble(
     move_number: int,
     color: str,
@@ -140,7 +260,7 @@ def create_video_preview_bubble(
             "text": f"📍 第 {move_number} 手（{color_text}）",
             "weight": "bold",
             "size": "lg",
-            "color": "#1DB446",
+            "color": _COLOR_GREEN,
         },
         {
             "type": "text",
@@ -165,7 +285,7 @@ def create_video_preview_bubble(
                 "type": "text",
                 "text": winrate_text,
                 "size": "sm",
-                "color": "#FF6B6B" if winrate_diff > 0 else "#4ECDC4",
+                "color": _COLOR_RED if winrate_diff > 0 else _COLOR_TEAL,
                 "margin": "sm",
             }
         )
@@ -177,12 +297,12 @@ def create_video_preview_bubble(
                 "type": "text",
                 "text": f"目差損失：{score_loss:.1f} 目",
                 "size": "sm",
-                "color": "#FF6B6B",
+                "color": _COLOR_RED,
                 "margin": "sm",
             }
         )
 
-    body_contents.append({"type": "separator", "margin": "md"})
+    body_contents.append(_SEPARATOR_MD)
     body_contents.append(
         {
             "type": "text",
@@ -197,11 +317,8 @@ def create_video_preview_bubble(
     return {
         "type": "bubble",
         "hero": {
-            "type": "image",
+            **_HERO_IMAGE_TEMPLATE,
             "url": preview_image_url,
-            "size": "full",
-            "aspectRatio": "1:1",
-            "aspectMode": "cover",
             "action": {"type": "uri", "uri": video_url, "label": "觀看動畫"},
         },
         "body": {
@@ -215,15 +332,12 @@ def create_video_preview_bubble(
             "spacing": "sm",
             "contents": [
                 {
-                    "type": "button",
-                    "style": "primary",
-                    "height": "sm",
+                    **_FOOTER_BUTTON_TEMPLATE,
                     "action": {
                         "type": "uri",
                         "label": "🎬 觀看動態棋譜",
                         "uri": video_url,
                     },
-                    "color": "#1DB446",
                 }
             ],
         },
@@ -311,9 +425,8 @@ async def send_message(
     # If there's a replyToken, try to use replyMessage
     if reply_token:
         try:
-            # Run synchronous call in thread pool
             request = ReplyMessageRequest(reply_token=reply_token, messages=messages)
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             logger.info(f"Sent reply message to {target_id} (message count: {len(messages)})")
             return True  # Successfully used replyMessage
         except ApiException as e:
@@ -326,7 +439,7 @@ async def send_message(
 
     # Use pushMessage
     request = PushMessageRequest(to=target_id, messages=messages)
-    await asyncio.to_thread(line_bot_api.push_message, request)
+    await get_line_bot_api().push_message(request)
     logger.info(f"Sent push message to {target_id} (message count: {len(messages)})")
     return False  # Used pushMessage
 
@@ -631,11 +744,9 @@ async def handle_review_command(target_id: str, reply_token: Optional[str]):
 
                     # Create FlexMessage from carousel_message dict
                     # carousel_message is already in the correct format for FlexMessage
-                    # Use from_json to create FlexContainer from the carousel contents
+                    # Use from_dict to create FlexContainer from the carousel contents (no JSON round trip)
                     carousel_contents = carousel_message["contents"]
-                    flex_container = FlexContainer.from_json(
-                        json.dumps(carousel_contents)
-                    )
+                    flex_container = FlexContainer.from_dict(carousel_contents)
                     flex_message = FlexMessage(
                         alt_text=carousel_message["altText"], contents=flex_container
                     )
@@ -749,15 +860,7 @@ async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
                 shape_text = f"目前形勢：{leader} +{lead_rounded:.1f} 目。"
 
         # 從 SGF 找最後一手座標，保持 last move 高亮
-        last_coords = None
-        sequence = sgf_game.get_main_sequence()
-        for node in sequence:
-            color, move = node.get_move()
-            if move is not None:
-                sgf_r, sgf_c = move
-                r = 18 - sgf_r
-                c = sgf_c
-                last_coords = (r, c)
+        last_coords = last_move_from_sgf(sgf_game)
 
         current_file = Path(__file__)
         project_root = current_file.parent.parent.parent
@@ -772,7 +875,7 @@ async def handle_evaluation_command(target_id: str, reply_token: Optional[str]):
         output_path = game_dir / filename
 
         visualizer.draw_board(
-            game.board,
+            game.array,
             last_move=last_coords,
             output_filename=str(output_path),
             territory=territory,
@@ -885,6 +988,18 @@ def get_game_state(target_id: str) -> Dict[str, Any]:
     return game_states[target_id]
 
 
+def last_move_from_sgf(sgf_game: sgf.Sgf_game) -> Optional[Tuple[int, int]]:
+    """Return engine coordinates (row, col) of the last move in the main sequence"""
+    # 從最後一個節點往回找，通常第一個節點就是最後一手
+    for node in reversed(sgf_game.get_main_sequence()):
+        move = node.get_move()[1]
+        if move is not None:
+            # move is (sgf_row, sgf_col), where sgf_row 0 is bottom
+            sgf_r, sgf_c = move
+            return 18 - sgf_r, sgf_c
+    return None
+
+
 def restore_game_from_sgf_file(sgf_path: str) -> Optional[Dict[str, Any]]:
     """Restore game state from a specific SGF file path"""
     try:
@@ -911,31 +1026,8 @@ def restore_game_from_sgf_file(sgf_path: str) -> Optional[Dict[str, Any]]:
                 last_move_coords = (r, c)
                 stone_val = 1 if color == "b" else 2
 
-                # Place stone on board
-                game.board[r][c] = stone_val
-
-                # Handle capture logic (simplified - just remove captured stones)
-                opponent = 2 if stone_val == 1 else 1
-                captured_stones = []
-                neighbors = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
-                for nr, nc in neighbors:
-                    if 0 <= nr < 19 and 0 <= nc < 19:
-                        if game.board[nr][nc] == opponent:
-                            group, libs = game.get_group_and_liberties(nr, nc)
-                            if libs == 0:
-                                for gr, gc in group:
-                                    captured_stones.append((gr, gc))
-
-                # Remove captured stones
-                for cr, cc in captured_stones:
-                    game.board[cr][cc] = 0
-
-                # Update ko point (simplified)
-                my_group, my_libs = game.get_group_and_liberties(r, c)
-                if len(captured_stones) == 1 and my_libs == 1:
-                    game.ko_point = captured_stones[0]
-                else:
-                    game.ko_point = None
+                # Place stone on board (the engine handles captures and ko)
+                game.replay_stone(r, c, stone_val)
 
                 # Switch turn
                 current_turn = 2 if stone_val == 1 else 1
@@ -1107,7 +1199,7 @@ async def handle_board_move(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"提示：{msg}")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         # Successfully placed stone
@@ -1150,7 +1242,7 @@ async def handle_board_move(
 
         # Draw board with last move highlighted
         visualizer.draw_board(
-            game.board, last_move=coords, output_filename=str(output_path)
+            game.array, last_move=coords, output_filename=str(output_path)
         )
 
         # Get public URL for image
@@ -1202,7 +1294,7 @@ async def handle_board_move(
                     reply_token=reply_token,
                     messages=messages,
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
             else:
                 logger.warning(f"Invalid image URL: {image_url}")
                 request = ReplyMessageRequest(
@@ -1213,7 +1305,7 @@ async def handle_board_move(
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
         else:
             logger.warning(f"PUBLIC_URL not set or invalid: {public_url}")
             request = ReplyMessageRequest(
@@ -1224,7 +1316,7 @@ async def handle_board_move(
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling board move: {error}", exc_info=True)
@@ -1232,7 +1324,7 @@ async def handle_board_move(
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 處理落子時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_undo_move(target_id: str, reply_token: Optional[str]):
@@ -1243,7 +1335,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="目前沒有進行中的對局，無法悔棋。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         state = game_states[target_id]
@@ -1259,7 +1351,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="目前是初始狀態，無法悔棋。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         try:
@@ -1302,20 +1394,8 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
             current_turn = state["current_turn"]
 
             # Find last move coordinates for highlighting from SGF sequence
-            last_coords = None
             sgf_game = state["sgf_game"]
-            sequence = sgf_game.get_main_sequence()
-            # Traverse sequence backwards to find the last move
-            for node in reversed(sequence):
-                color, move = node.get_move()
-                if move is not None:
-                    # move is (sgf_row, sgf_col), where sgf_row 0 is bottom
-                    sgf_r, sgf_c = move
-                    # Convert to engine coordinates (row 0 is top)
-                    r = 18 - sgf_r
-                    c = sgf_c
-                    last_coords = (r, c)
-                    break  # Found the last move, exit loop
+            last_coords = last_move_from_sgf(sgf_game)
 
             # Draw board
             game_id = get_game_id(target_id)
@@ -1327,7 +1407,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
             output_path = game_dir / filename
 
             visualizer.draw_board(
-                game.board, last_move=last_coords, output_filename=str(output_path)
+                game.array, last_move=last_coords, output_filename=str(output_path)
             )
 
             # Send board image
@@ -1350,7 +1430,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                             ),
                         ],
                     )
-                    await asyncio.to_thread(line_bot_api.reply_message, request)
+                    await get_line_bot_api().reply_message(request)
                 else:
                     request = ReplyMessageRequest(
                         reply_token=reply_token,
@@ -1360,7 +1440,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                             )
                         ],
                     )
-                    await asyncio.to_thread(line_bot_api.reply_message, request)
+                    await get_line_bot_api().reply_message(request)
             else:
                 request = ReplyMessageRequest(
                     reply_token=reply_token,
@@ -1370,7 +1450,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
 
         except Exception as e:
             logger.error(f"Error undoing move: {e}", exc_info=True)
@@ -1378,7 +1458,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"悔棋失敗：{str(e)}")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling undo move: {error}", exc_info=True)
@@ -1386,7 +1466,7 @@ async def handle_undo_move(target_id: str, reply_token: Optional[str]):
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 處理悔棋時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], game_id: str):
@@ -1401,7 +1481,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                 reply_token=reply_token,
                 messages=[TextMessage(text="找不到存檔。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Find SGF file for this game_id
@@ -1412,7 +1492,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"找不到 game_id 為 {game_id} 的棋譜。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Restore game state
@@ -1422,7 +1502,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                 reply_token=reply_token,
                 messages=[TextMessage(text="讀取失敗：無法解析棋譜檔案。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Update game_id
@@ -1464,7 +1544,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
         output_path = game_dir / filename
         
         visualizer.draw_board(
-            game.board, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
+            game.array, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
         )
         
         # Send board image
@@ -1489,7 +1569,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                         ),
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
             else:
                 request = ReplyMessageRequest(
                     reply_token=reply_token,
@@ -1499,7 +1579,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
         else:
             request = ReplyMessageRequest(
                 reply_token=reply_token,
@@ -1509,7 +1589,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
     
     except Exception as error:
         logger.error(f"Error handling load game by ID: {error}", exc_info=True)
@@ -1517,7 +1597,7 @@ async def handle_load_game_by_id(target_id: str, reply_token: Optional[str], gam
             reply_token=reply_token,
             messages=[TextMessage(text=f"讀取失敗：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_load_game_by_id_with_moves(
@@ -1542,7 +1622,7 @@ async def handle_load_game_by_id_with_moves(
                 reply_token=reply_token,
                 messages=[TextMessage(text="找不到存檔。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Find SGF file for the source game_id
@@ -1553,7 +1633,7 @@ async def handle_load_game_by_id_with_moves(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"找不到 game_id 為 {source_game_id} 的棋譜。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Load source SGF file
@@ -1569,7 +1649,7 @@ async def handle_load_game_by_id_with_moves(
                 reply_token=reply_token,
                 messages=[TextMessage(text=f"該棋譜只有 {total_moves} 手，無法讀取到第 {move_count} 手。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         # Create new SGF with only first N moves
@@ -1596,7 +1676,7 @@ async def handle_load_game_by_id_with_moves(
                 reply_token=reply_token,
                 messages=[TextMessage(text="讀取失敗：無法解析棋譜檔案。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
         
         game_states[target_id] = restored
@@ -1633,7 +1713,7 @@ async def handle_load_game_by_id_with_moves(
         output_path = new_game_dir / filename
         
         visualizer.draw_board(
-            game.board, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
+            game.array, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
         )
         
         # Send board image
@@ -1659,7 +1739,7 @@ async def handle_load_game_by_id_with_moves(
                         ),
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
             else:
                 request = ReplyMessageRequest(
                     reply_token=reply_token,
@@ -1669,7 +1749,7 @@ async def handle_load_game_by_id_with_moves(
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
         else:
             request = ReplyMessageRequest(
                 reply_token=reply_token,
@@ -1679,7 +1759,7 @@ async def handle_load_game_by_id_with_moves(
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
     
     except Exception as error:
         logger.error(f"Error handling load game by ID with moves: {error}", exc_info=True)
@@ -1687,7 +1767,7 @@ async def handle_load_game_by_id_with_moves(
             reply_token=reply_token,
             messages=[TextMessage(text=f"讀取失敗：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_load_game(target_id: str, reply_token: Optional[str]):
@@ -1702,7 +1782,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="找不到存檔。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         # Find latest SGF file for this target
@@ -1714,7 +1794,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="找不到存檔。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         # Get the latest file
@@ -1731,7 +1811,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="讀取失敗：無法解析棋譜檔案。")],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
             return
 
         game_states[target_id] = restored
@@ -1770,7 +1850,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
         output_path = game_dir / filename
 
         visualizer.draw_board(
-            game.board, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
+            game.array, last_move=last_coords, output_filename=str(output_path), move_numbers=move_numbers
         )
 
         # Send board image
@@ -1795,7 +1875,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                         ),
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
             else:
                 request = ReplyMessageRequest(
                     reply_token=reply_token,
@@ -1805,7 +1885,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                         )
                     ],
                 )
-                await asyncio.to_thread(line_bot_api.reply_message, request)
+                await get_line_bot_api().reply_message(request)
         else:
             request = ReplyMessageRequest(
                 reply_token=reply_token,
@@ -1815,7 +1895,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
                     )
                 ],
             )
-            await asyncio.to_thread(line_bot_api.reply_message, request)
+            await get_line_bot_api().reply_message(request)
 
     except Exception as error:
         logger.error(f"Error handling load game: {error}", exc_info=True)
@@ -1823,7 +1903,7 @@ async def handle_load_game(target_id: str, reply_token: Optional[str]):
             reply_token=reply_token,
             messages=[TextMessage(text=f"讀取失敗：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_text_message(event: Dict[str, Any]):
@@ -1839,10 +1919,7 @@ async def handle_text_message(event: Dict[str, Any]):
         bot_display_name = await get_bot_display_name()
         text_mention_matched = False
         if bot_display_name:
-            # Escape special regex characters in bot display name
-            escaped_display_name = re.escape(bot_display_name)
-            text_mention_pattern = rf"^@{escaped_display_name}\s+(.+)$"
-            text_mention_match = re.match(text_mention_pattern, text, re.IGNORECASE)
+            text_mention_match = _text_mention_re(bot_display_name).match(text)
             
             if text_mention_match:
                 # Extract command after @{bot_display_name}
@@ -1893,25 +1970,29 @@ async def handle_text_message(event: Dict[str, Any]):
                 return
 
             # Remove mention markers to get actual command
-            clean_text = text
-            # Sort mentions by index descending to avoid index position changes
-            for mention_obj in sorted(
-                mentions, key=lambda x: x.get("index", 0), reverse=True
-            ):
+            # 依 index 由前往後掃一次，只收集 mention 之間的文字，最後 join 一次
+            parts = []
+            cursor = 0
+            for mention_obj in sorted(mentions, key=lambda x: x.get("index", 0)):
                 index = mention_obj.get("index", 0)
                 length = mention_obj.get("length", 0)
-                clean_text = clean_text[:index] + clean_text[index + length :]
+                if index > cursor:
+                    parts.append(text[cursor:index])
+                cursor = max(cursor, index + length)
+            parts.append(text[cursor:])
+
+            text = "".join(parts).strip()
 
-            text = clean_text.strip()
+    command = _parse_command(text)
 
-    if text in ["help", "幫助", "說明"]:
+    if command == "help":
         request = ReplyMessageRequest(
             reply_token=reply_token, messages=[TextMessage(text=HELP_MESSAGE)]
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if text == "覆盤" or text.lower() == "review":
+    if command == "review":
         # Get push target ID
         target_id = (
             source.get("groupId") or source.get("roomId") or source.get("userId")
@@ -1920,7 +2001,7 @@ async def handle_text_message(event: Dict[str, Any]):
         await handle_review_command(target_id, reply_token)
         return
 
-    if text == "形勢" or text == "形式" or text.lower() == "evaluation":
+    if command == "evaluation":
         target_id = (
             source.get("groupId") or source.get("roomId") or source.get("userId")
         )
@@ -1931,17 +2012,15 @@ async def handle_text_message(event: Dict[str, Any]):
     target_id = source.get("groupId") or source.get("roomId") or source.get("userId")
 
     # Check if input is a board coordinate (A-T, 1-19)
-    # Pattern matches coordinates like "D4", "Q16", etc. (skips 'I')
-    coord_pattern = r"^[A-HJ-T]([1-9]|1[0-9])$"
     user_text_upper = text.upper().strip()
 
-    if re.match(coord_pattern, user_text_upper):
+    if _COORD_RE.match(user_text_upper):
         # Handle board coordinate input
         await handle_board_move(target_id, reply_token, user_text_upper, source)
         return
 
     # Handle "對弈" to show current mode status
-    if text.lower() in ["對弈", "vs"]:
+    if command == "vs":
         # Check current VS AI mode status
         vs_ai_mode = is_vs_ai_mode(target_id)
         state = get_game_state(target_id)
@@ -1986,11 +2065,11 @@ async def handle_text_message(event: Dict[str, Any]):
             reply_token=reply_token,
             messages=[TextMessage(text=status_message)],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
     # Handle "對弈 ai" to enable VS AI mode
-    if text.lower() in ["對弈 ai", "對弈ai", "vs ai", "vsai"]:
+    if command == "vs_ai":
         # Enable VS AI mode
         success = enable_vs_ai_mode(target_id)
         if success:
@@ -2013,11 +2092,11 @@ async def handle_text_message(event: Dict[str, Any]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="❌ 開啟對弈模式失敗，請稍後再試。")],
             )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
     # Handle "對弈 free" to disable VS AI mode
-    if text.lower() in ["對弈 free", "對弈free", "vs free", "vsfree"]:
+    if command == "vs_free":
         # Disable VS AI mode
         success = disable_vs_ai_mode(target_id)
         if success:
@@ -2034,10 +2113,10 @@ async def handle_text_message(event: Dict[str, Any]):
                 reply_token=reply_token,
                 messages=[TextMessage(text="❌ 關閉對弈模式失敗，請稍後再試。")],
             )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if "投子" in text:
+    if command == "resign":
         state = get_game_state(target_id)
         current_turn = state.get("current_turn", 1)
         resign_side = "黑" if current_turn == 1 else "白"
@@ -2051,26 +2130,26 @@ async def handle_text_message(event: Dict[str, Any]):
                 TextMessage(text="棋盤已重置，黑棋請下。"),
             ],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if "重置" in text or "reset" in text.lower():
+    if command == "reset":
         reset_game_state(target_id)
         request = ReplyMessageRequest(
             reply_token=reply_token,
             messages=[TextMessage(text="棋盤已重置，黑棋請下。")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
         return
 
-    if "悔棋" in text or "undo" in text.lower():
+    if command == "undo":
         await handle_undo_move(target_id, reply_token)
         return
 
-    if "讀取" in text or "load" in text.lower():
+    if command == "load":
         # Match "讀取 game_1234567890 10" or "讀取 game_1234567890 10" or "load game_1234567890 10"
         # Pattern: (讀取|load) game_\d+ \d+
-        read_with_moves_match = re.match(r"(?:讀取|load)\s+(game_\d+)\s+(\d+)", text, re.IGNORECASE)
+        read_with_moves_match = _LOAD_GAME_MOVES_RE.match(text)
         if read_with_moves_match:
             game_id = read_with_moves_match.group(1).strip()
             move_count_str = read_with_moves_match.group(2).strip()
@@ -2083,7 +2162,7 @@ async def handle_text_message(event: Dict[str, Any]):
                 pass  # Invalid move count, fall through to regular load
         
         # Match "讀取 game_1234567890" or "讀取game_1234567890" or "load game_1234567890"
-        read_match = re.match(r"(?:讀取|load)\s*(game_\d+)", text, re.IGNORECASE)
+        read_match = _LOAD_GAME_RE.match(text)
         if read_match:
             game_id = read_match.group(1).strip()
             if game_id:
@@ -2149,14 +2228,14 @@ async def handle_file_message(event: Dict[str, Any]):
                 )
             ],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
     except Exception as error:
         logger.error(f"Error handling file message: {error}", exc_info=True)
         request = ReplyMessageRequest(
             reply_token=reply_token,
             messages=[TextMessage(text=f"❌ 儲存棋譜時發生錯誤：{str(error)}")],
         )
-        await asyncio.to_thread(line_bot_api.reply_message, request)
+        await get_line_bot_api().reply_message(request)
 
 
 async def handle_ai_next_move(
@@ -2176,12 +2255,6 @@ async def handle_ai_next_move(
         user_board_image_url: User's board image URL (if available)
     """
     try:
-        from handlers.katago_handler import run_katago_gtp_next_move
-        from linebot.v3.messaging.models import TextMessage, ImageMessage
-        from sgfmill import sgf
-        import time
-        from config import config
-        
         logger.info(f"Getting AI's next move: target_id={target_id}, current_turn={current_turn}")
         
         # Run KataGo GTP to get next move
@@ -2288,7 +2361,7 @@ async def handle_ai_next_move(
         output_path = game_dir / filename
         
         visualizer.draw_board(
-            game.board, last_move=coords, output_filename=str(output_path)
+            game.array, last_move=coords, output_filename=str(output_path)
         )
         
         # Get public URL for image
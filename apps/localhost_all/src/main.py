@@ -33,7 +33,11 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
-    pass
+    from handlers.line_handler import close_line_bot_api
+    from handlers.katago_handler import close_gtp_engines
+
+    await close_line_bot_api()
+    await close_gtp_engines()
 
 
 app = FastAPI(title="Go Line Bot API", lifespan=lifespan)